@@ -19,3 +19,9 @@ class IClient(ABC):
         """
         pass
 
+    @abstractmethod
+    def close(self):
+        """
+        Abstract method to close any persistent connections held by the client.
+        """
+        pass
@@ -111,3 +111,110 @@ class ICryptoUtils(ABC):
         """
         pass
 
+    @abstractmethod
+    def register_cipher_suite(self, suite: "ICipherSuite"):
+        """
+        Registers a cipher suite so it can be advertised and negotiated.
+
+        Args:
+            suite (ICipherSuite): The cipher suite implementation to register.
+        """
+        pass
+
+    @abstractmethod
+    def preferred_cipher_suites(self) -> list[str]:
+        """
+        Returns the registered suite names ranked by local throughput
+        (fastest first), using a cached startup micro-benchmark.
+
+        Returns:
+            list[str]: The ranked suite names.
+        """
+        pass
+
+    @abstractmethod
+    def negotiate_cipher_suite(self, offered: list[str]) -> str:
+        """
+        Picks the suite both peers support that ranks best across both sides.
+
+        Args:
+            offered (list[str]): The peer's supported suites, in its preference order.
+
+        Returns:
+            str: The name of the agreed suite.
+        """
+        pass
+
+
+class ICipherSuite(ABC):
+    """
+    Abstract Base Class (ABC) defining a pluggable symmetric cipher suite.
+    Concrete suites are registered with `crypto_utils.register_cipher_suite`
+    and can then be advertised, benchmarked and negotiated between client and server.
+    """
+
+    # Name advertised on the wire (ASCII, at most 255 bytes).
+    name: str = None
+    # Size of the symmetric key in bytes.
+    key_size: int = 32
+
+    @abstractmethod
+    def generate_key(self) -> bytes:
+        """
+        Generates a random key suitable for this suite.
+
+        Returns:
+            bytes: The generated key.
+        """
+        pass
+
+    @abstractmethod
+    def encrypt(self, data: bytes, key: bytes) -> bytes:
+        """
+        Encrypts data with this suite.
+
+        Args:
+            data (bytes): The plaintext to be encrypted.
+            key (bytes): The symmetric key.
+
+        Returns:
+            bytes: A self-contained ciphertext (IV/nonce and tag included).
+        """
+        pass
+
+    @abstractmethod
+    def decrypt(self, encrypted_data: bytes, key: bytes) -> bytes:
+        """
+        Decrypts data produced by `encrypt`.
+
+        Args:
+            encrypted_data (bytes): The ciphertext returned by `encrypt`.
+            key (bytes): The symmetric key.
+
+        Returns:
+            bytes: The original plaintext.
+        """
+        pass
+
+    @abstractmethod
+    def decryptor(self, key: bytes):
+        """
+        Returns an incremental decryptor for data produced by `encrypt`, so large
+        payloads can be decrypted chunk by chunk without holding them in memory.
+        The object provides `update(chunk) -> bytes` and `finalize() -> bytes`;
+        `finalize` raises ValueError if the data is truncated or fails authentication.
+
+        Args:
+            key (bytes): The symmetric key.
+        """
+        pass
+
+    def plaintext_size(self, ciphertext_size: int):
+        """
+        Returns the plaintext size of a ciphertext of `ciphertext_size` bytes,
+        or None if it cannot be known without decrypting (padded modes).
+
+        Args:
+            ciphertext_size (int): The size of data produced by `encrypt`.
+        """
+        return None
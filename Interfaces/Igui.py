@@ -55,8 +55,7 @@ class IGUI(ABC):
     def set_client_download_directory(self):
         """
         Abstract method to open a file dialog, allowing the user to select
-        a directory where the client would save received files (if client
-        had receiving functionality).
+        a directory where the client saves files downloaded from the server.
         """
         pass
 
@@ -95,6 +94,36 @@ class IGUI(ABC):
         """
         pass
 
+    @abstractmethod
+    def _perform_send_files(self, filepaths: list[str]):
+        """
+        Abstract method to send several selected files in a separate thread,
+        packing small files into shared encrypted containers.
+
+        Args:
+            filepaths (list[str]): The paths to the files to be sent.
+        """
+        pass
+
+    @abstractmethod
+    def download_file_via_client(self):
+        """
+        Abstract method to ask for the name of a file on the server and
+        download it into the client download directory.
+        """
+        pass
+
+    @abstractmethod
+    def _perform_download_file(self, filename: str):
+        """
+        Abstract method to encapsulate the actual download logic
+        to be executed in a separate thread, preventing GUI freezes.
+
+        Args:
+            filename (str): The name of the file on the server.
+        """
+        pass
+
     @abstractmethod
     def _on_closing(self):
         """
@@ -27,3 +27,13 @@ class IServer(ABC):
         """
         pass
 
+    @abstractmethod
+    def is_running(self):
+        """
+        Abstract method to check whether the server is running.
+
+        Returns:
+            bool: True while the server is running and has not been asked to stop.
+        """
+        pass
+
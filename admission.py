@@ -0,0 +1,81 @@
+# admission.py
+
+import threading
+import time
+
+
+class AdmissionController:
+    """
+    Server-side admission control shared by all connection threads.
+
+    - Each client address may hold at most `max_connections_per_client`
+      connections; further connections are answered with "busy, retry after".
+    - Uploads buffered in memory reserve their size against a global
+      `memory_budget`. When the budget is full, callers can wait for other
+      uploads to finish (which leaves data queued in TCP, so senders are
+      throttled by the socket) or fall back to streaming through a temp file.
+    """
+
+    def __init__(self, memory_budget, max_connections_per_client):
+        self.memory_budget = memory_budget
+        self.max_connections_per_client = max_connections_per_client
+        self._condition = threading.Condition()
+        self._in_flight_bytes = 0
+        self._connections = {}
+
+    @property
+    def in_flight_bytes(self):
+        with self._condition:
+            return self._in_flight_bytes
+
+    def admit_connection(self, client_id):
+        """
+        Registers a new connection from `client_id`.
+
+        Returns:
+            bool: False if the client already holds its maximum number of connections.
+        """
+        with self._condition:
+            count = self._connections.get(client_id, 0)
+            if count >= self.max_connections_per_client:
+                return False
+            self._connections[client_id] = count + 1
+            return True
+
+    def release_connection(self, client_id):
+        with self._condition:
+            count = self._connections.get(client_id, 0) - 1
+            if count > 0:
+                self._connections[client_id] = count
+            else:
+                self._connections.pop(client_id, None)
+
+    def reserve_memory(self, size, timeout=None):
+        """
+        Reserves `size` bytes of the in-memory budget, waiting for other uploads
+        to release theirs if needed.
+
+        Args:
+            size (int): The number of bytes to reserve.
+            timeout (float, optional): Maximum seconds to wait; None waits indefinitely.
+
+        Returns:
+            bool: True if the bytes were reserved (release them with release_memory),
+                  False if they could not be reserved in time or never fit the budget.
+        """
+        if size > self.memory_budget:
+            return False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._in_flight_bytes + size > self.memory_budget:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            self._in_flight_bytes += size
+            return True
+
+    def release_memory(self, size):
+        with self._condition:
+            self._in_flight_bytes -= size
+            self._condition.notify_all()
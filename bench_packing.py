@@ -0,0 +1,112 @@
+# bench_packing.py
+#
+# Benchmark: many small files sent one by one (one MSG_FILE each) versus
+# packed into encrypted containers (MSG_PACK). Each mode runs against its own
+# freshly started server process; a run ends when the server has acknowledged
+# every file as saved. Defaults to 50,000 x 1 KB files.
+#
+#   python bench_packing.py --files 50000 --size 1K --output packing.json
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from loadgen import ProcessSampler, parse_size, run_server_process, wait_for_port
+
+MODES = ('per-file', 'packed')
+
+
+def run_mode(mode, args, port, payloads):
+    """Sends all payloads in one mode and returns its measurements."""
+    import client
+    save_directory = tempfile.mkdtemp(prefix=f'bench_{mode}_')
+    server_process = multiprocessing.Process(target=run_server_process, args=(port, save_directory, {}), daemon=True)
+    server_process.start()
+    try:
+        if not wait_for_port(args.host, port, args.startup_timeout):
+            raise RuntimeError(f"Server did not start listening on {args.host}:{port}")
+        sampler = ProcessSampler(server_process.pid, 0)
+        cpu_before = sampler.read()[0]
+        transfer_client = client.FileTransferClient(host=args.host, port=port, max_pool_size=1)
+
+        start = time.perf_counter()
+        entries = ((f"file_{i}.bin", data) for i, data in enumerate(payloads))
+        # Sends return once the server has acknowledged the files as saved (or raise), so the
+        # run is over when the last one returns
+        if mode == 'packed':
+            transfer_client.send_packed(entries, args.pack_bytes)
+        else:
+            for filename, data in entries:
+                transfer_client.send_data(filename, data)
+        elapsed = time.perf_counter() - start
+
+        cpu_after = sampler.read()[0]
+        transfer_client.close()
+    finally:
+        server_process.terminate()
+        server_process.join(5)
+        shutil.rmtree(save_directory, ignore_errors=True)
+
+    total_bytes = sum(len(data) for data in payloads)
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "files_per_s": round(len(payloads) / elapsed, 1),
+        "mb_per_s": round(total_bytes / elapsed / 1e6, 3),
+        "server_cpu_seconds": None if cpu_before is None or cpu_after is None else round(cpu_after - cpu_before, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare per-file and packed sends of many small files.")
+    parser.add_argument('--files', type=int, default=50000)
+    parser.add_argument('--size', type=parse_size, default=parse_size('1K'), help="Size of each file")
+    parser.add_argument('--pack-bytes', type=parse_size, default=None,
+                        help="Maximum container size (default: PACK_MAX_BYTES from config.py)")
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9996, help="First port; each mode uses its own")
+    parser.add_argument('--startup-timeout', type=float, default=15)
+    parser.add_argument('--output', help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+    if args.pack_bytes is None:
+        from config import PACK_MAX_BYTES
+        args.pack_bytes = PACK_MAX_BYTES
+
+    payloads = [os.urandom(args.size) for _ in range(args.files)]
+
+    # The client logs every transfer; keep the console for the summary
+    real_stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        results = {mode: run_mode(mode, args, args.port + i, payloads) for i, mode in enumerate(args.modes)}
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+
+    report = {
+        "config": {"files": args.files, "file_size": args.size, "pack_bytes": args.pack_bytes},
+        "results": results,
+    }
+    if len(results) == 2:
+        report["speedup"] = round(results['per-file']['elapsed_s'] / results['packed']['elapsed_s'], 1)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+        for mode, result in results.items():
+            print(f"[+] {mode}: {result['elapsed_s']} s, {result['files_per_s']} files/s, "
+                  f"server CPU {result['server_cpu_seconds']} s")
+        if "speedup" in report:
+            print(f"[+] Packed is {report['speedup']}x faster. Report: {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+# bench_workers.py
+#
+# Benchmark: aggregate upload throughput of the server with 1, 2, 4, ...
+# worker processes (SERVER_WORKERS). Each worker count runs against its own
+# freshly started server; load comes from several client processes sending
+# back-to-back, so the client side is not limited by one interpreter lock
+# either. Server and clients share the machine: give it at least as many
+# cores as workers plus client processes, or the numbers flatten out.
+# All clients connect from one address, so the server's per-client
+# connection limit is raised to admit every connection at every worker count.
+#
+#   python bench_workers.py --workers 1 2 4 8 --client-processes 8 --size 1M --output workers.json
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import time
+
+from loadgen import parse_size, run_server_process, wait_for_port
+
+
+def client_process(host, port, size, connections, duration, results):
+    """Process target: uploads `size`-byte files over `connections` connections until `duration` is up."""
+    import threading
+    import client
+    sys.stdout = open(os.devnull, 'w')
+    transfer_client = client.FileTransferClient(host=host, port=port, max_pool_size=connections)
+    payload = os.urandom(size)
+    deadline = time.monotonic() + duration
+    counts = []
+    errors = []
+
+    def sender(index):
+        sent = 0
+        failed = 0
+        while time.monotonic() < deadline:
+            try:
+                transfer_client.send_data(f"bench_{os.getpid()}_{index}_{sent}.bin", payload)
+                sent += 1
+            except Exception:
+                failed += 1  # Counted, not fatal: a lost thread would silently shrink the load
+        counts.append(sent)
+        errors.append(failed)
+
+    threads = [threading.Thread(target=sender, args=(i,)) for i in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    transfer_client.close()
+    results.put((sum(counts), sum(errors)))
+
+
+def run_workers(workers, args, port):
+    """Runs one load phase against a server with `workers` processes and returns its measurements."""
+    save_directory = tempfile.mkdtemp(prefix=f'bench_workers_{workers}_')
+    context = multiprocessing.get_context('spawn')
+    overrides = {
+        'SERVER_WORKERS': workers,
+        # Every connection comes from this machine; the default limit would turn some away
+        # at low worker counts (the limit is per worker) and inflate the speedup
+        'SERVER_MAX_CONNECTIONS_PER_CLIENT': args.client_processes * args.connections,
+    }
+    # Not a daemon: daemonic processes cannot start the server's worker processes
+    server_process = context.Process(target=run_server_process, args=(port, save_directory, overrides))
+    server_process.start()
+    clients = []
+    try:
+        if not wait_for_port(args.host, port, args.startup_timeout):
+            raise RuntimeError(f"Server did not start listening on {args.host}:{port}")
+        results = context.Queue()
+        clients = [context.Process(target=client_process,
+                                   args=(args.host, port, args.size, args.connections, args.duration, results))
+                   for _ in range(args.client_processes)]
+        start = time.perf_counter()
+        for process in clients:
+            process.start()
+        uploads = errors = 0
+        # A client process that dies never reports; don't wait for it forever
+        deadline = time.monotonic() + args.duration + args.result_timeout
+        for _ in clients:
+            try:
+                sent, failed = results.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                exit_codes = [process.exitcode for process in clients]
+                raise RuntimeError(f"Client processes did not report results (exit codes {exit_codes})") from None
+            uploads += sent
+            errors += failed
+        elapsed = time.perf_counter() - start
+        for process in clients:
+            process.join()
+    finally:
+        for process in clients:
+            if process.is_alive():
+                process.terminate()
+        server_process.terminate()
+        server_process.join(15)
+        shutil.rmtree(save_directory, ignore_errors=True)
+
+    return {
+        "uploads": uploads,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "uploads_per_s": round(uploads / elapsed, 1),
+        "mb_per_s": round(uploads * args.size / elapsed / 1e6, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure upload throughput against the number of server processes.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--client-processes', type=int, default=4)
+    parser.add_argument('--connections', type=int, default=2, help="Concurrent uploads per client process")
+    parser.add_argument('--size', type=parse_size, default=parse_size('1M'), help="Size of each upload")
+    parser.add_argument('--duration', type=float, default=15, help="Seconds of load per worker count")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9990, help="First port; each worker count uses its own")
+    parser.add_argument('--startup-timeout', type=float, default=30)
+    parser.add_argument('--result-timeout', type=float, default=60,
+                        help="Seconds past --duration to wait for client processes to report")
+    parser.add_argument('--output', help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for i, workers in enumerate(args.workers):
+        results[workers] = run_workers(workers, args, args.port + i)
+    baseline = results[args.workers[0]]["uploads_per_s"]
+    for workers, result in results.items():
+        result["speedup"] = round(result["uploads_per_s"] / baseline, 2) if baseline else None
+
+    report = {
+        "config": {
+            "cpu_count": os.cpu_count(),
+            "client_processes": args.client_processes,
+            "connections_per_process": args.connections,
+            "server_max_connections_per_client": args.client_processes * args.connections,
+            "upload_size": args.size,
+            "duration_s": args.duration,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+        for workers, result in results.items():
+            print(f"[+] {workers} worker(s): {result['mb_per_s']} MB/s, {result['uploads_per_s']} uploads/s "
+                  f"({result['speedup']}x, {result['errors']} errors)")
+        print(f"[+] Report: {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
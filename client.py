@@ -1,16 +1,67 @@
 # client.py
 
+import collections
+import concurrent.futures
+import hashlib
+import itertools
+import json
 import socket
 import os
+import random
+import selectors
+import threading
+import time
 from crypto_utils import (
-    generate_aes_key,
-    encrypt_file,
+    get_cipher_suite,
+    preferred_cipher_suites,
     rsa_encrypt
 )
+from framing import (
+    DIGEST_SIZE,
+    HELLO_BUSY,
+    HELLO_OK,
+    MSG_ACK,
+    MSG_CLOSE,
+    MSG_DOWNLOAD,
+    MSG_FILE,
+    MSG_PACK,
+    MSG_PING,
+    MSG_PONG,
+    MSG_STAT,
+    PACK_ENTRY_OVERHEAD,
+    STATUS_CHANGED,
+    STATUS_NOT_FOUND,
+    STATUS_OK,
+    build_pack,
+    recv_exactly,
+    recv_u8,
+    recv_u16,
+    recv_u32,
+    recv_u64,
+    send_buffers,
+    set_nodelay,
+    tune_socket,
+    u8,
+    u32,
+    u64
+)
+from config import (
+    CHUNK_SIZE,
+    CLIENT_ACK_TIMEOUT,
+    CLIENT_ACK_WINDOW,
+    CLIENT_BUSY_MAX_BACKOFF,
+    CLIENT_BUSY_MAX_RETRIES,
+    CLIENT_POOL_HEALTH_CHECK_AFTER,
+    CLIENT_POOL_IDLE_TIMEOUT,
+    CLIENT_POOL_MAX_SIZE,
+    DOWNLOAD_PARALLEL_RANGES,
+    DOWNLOAD_RANGE_SIZE,
+    PACK_FILE_THRESHOLD,
+    PACK_MAX_BYTES
+)
 
 SERVER_HOST = '127.0.0.1'
 SERVER_PORT = 9999
-BUFFER_SIZE = 4096
 
 # Load the server's public key
 # This file must exist for the client to work.
@@ -21,11 +72,747 @@ except FileNotFoundError:
     print("[!] Error: 'server_public.pem' not found. Please run the server at least once to generate keys.")
     server_public_key = None # Set to None to handle gracefully if key is missing
 
+
+class ServerBusyError(ConnectionError):
+    """The server refused the connection as busy and asked us to retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Server is busy, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class TransferRejectedError(Exception):
+    """
+    Some uploads of a send were not saved: the server answered that it could
+    not save them, or (for files read from disk) they could not be read here.
+    """
+
+    def __init__(self, failures, saved=0):
+        """
+        Args:
+            failures (list[tuple[str, str]]): (upload label, reason) per rejected upload.
+            saved (int): The number of files of the same send that were saved.
+        """
+        details = "; ".join(f"{label}: {reason}" for label, reason in failures[:3])
+        if len(failures) > 3:
+            details += f"; and {len(failures) - 3} more"
+        super().__init__(f"{len(failures)} upload(s) were not saved: {details}")
+        self.failures = failures
+        self.saved = saved
+
+
+class FileChangedError(Exception):
+    """The file was replaced on the server while it was being downloaded."""
+
+
+class _PooledConnection:
+    """A connected socket that has completed the cipher-suite handshake."""
+
+    def __init__(self, sock, suite):
+        self.sock = sock
+        self.suite = suite
+        self.last_used = time.monotonic()
+        self.next_sequence = 0  # Sequence number of the next upload, echoed in its acknowledgement
+
+    def close(self):
+        try:
+            send_buffers(self.sock, [u8(MSG_CLOSE)])
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class _Upload:
+    """One MSG_FILE or MSG_PACK message; `prepare(connection)` encrypts it when it is (re)sent."""
+
+    def __init__(self, label, file_count, prepare):
+        self.label = label
+        self.file_count = file_count
+        self.prepare = prepare
+
+
+class _UploadBatch:
+    """The uploads of one send call. Kept outside the connection so a retry can pick up where it failed."""
+
+    def __init__(self, uploads):
+        self.source = iter(uploads)
+        self.pending = collections.deque()  # Taken from source, not yet acknowledged
+        self.saved = 0
+        self.failures = []
+
+
+def _file_reader(file_path):
+    def read():
+        with open(file_path, 'rb') as f:
+            return f.read()
+    return read
+
+
+class FileTransferClient:
+    """
+    Sends files to the server over a pool of persistent, health-checked connections.
+    Each connection negotiates a cipher suite once and then carries any number
+    of files. Safe to use from multiple threads: every send borrows its own connection.
+    Sends return once the server has acknowledged every file as saved.
+    """
+
+    def __init__(self, host=None, port=None, max_pool_size=CLIENT_POOL_MAX_SIZE,
+                 idle_timeout=CLIENT_POOL_IDLE_TIMEOUT, public_key=None):
+        """
+        Args:
+            host (str, optional): Server address. Defaults to SERVER_HOST.
+            port (int, optional): Server port. Defaults to SERVER_PORT.
+            max_pool_size (int): Maximum number of open connections; further senders wait.
+            idle_timeout (float): Seconds an unused connection stays in the pool.
+            public_key (bytes, optional): The server's RSA public key. Defaults to 'server_public.pem'.
+        """
+        self.host = host or SERVER_HOST
+        self.port = port or SERVER_PORT
+        self.max_pool_size = max_pool_size
+        self.idle_timeout = idle_timeout
+        self.public_key = public_key or server_public_key
+        self._idle = []  # Most recently used last, so the warmest connection is reused first
+        self._open_count = 0
+        self._pool_lock = threading.Condition()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _connect(self):
+        """Opens a new connection and negotiates the cipher suite."""
+        # Our supported cipher suites, ranked by local throughput (cached micro-benchmark)
+        offered_suites = preferred_cipher_suites()
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            # Buffer sizes must be set before connect() to affect the TCP window scale
+            tune_socket(sock)
+            sock.connect((self.host, self.port))
+            set_nodelay(sock)
+            print(f"[*] Connected to server at {self.host}:{self.port}.")
+
+            # Advertise our cipher suites: count (1 byte), then length-prefixed names
+            hello = [u8(len(offered_suites))]
+            for name in offered_suites:
+                hello += [u8(len(name)), name.encode('ascii')]
+            send_buffers(sock, hello)
+
+            # The server answers with a status byte, then the agreed suite name
+            # (HELLO_OK) or how long to wait before retrying (HELLO_BUSY)
+            status = recv_u8(sock)
+            if status == HELLO_BUSY:
+                raise ServerBusyError(recv_u32(sock) / 1000)
+            if status != HELLO_OK:
+                raise ConnectionError("Server does not support any of our cipher suites")
+            chosen_length = recv_u8(sock)
+            suite = get_cipher_suite(recv_exactly(sock, chosen_length).decode('ascii'))
+            print(f"[+] Negotiated cipher suite: {suite.name}")
+        except BaseException:
+            sock.close()
+            raise
+        return _PooledConnection(sock, suite)
+
+    def _busy_delay(self, attempt, retry_after):
+        """
+        Exponential backoff after a "busy, retry after" answer. Waits are never
+        shorter than the server asked for and are jittered so rejected clients
+        do not retry in lockstep.
+        """
+        delay = min(CLIENT_BUSY_MAX_BACKOFF, retry_after * (2 ** attempt))
+        return delay * random.uniform(1.0, 1.5)
+
+    def _is_healthy(self, connection):
+        """
+        Checks a pooled connection before reuse. A readable idle socket means the
+        server closed it (or sent something unexpected). Connections idle for a
+        while are additionally verified with a ping round trip.
+        """
+        try:
+            # A selector rather than select.select(), which fails for descriptors above 1023
+            with selectors.DefaultSelector() as selector:
+                selector.register(connection.sock, selectors.EVENT_READ)
+                if selector.select(0):
+                    return False
+            if time.monotonic() - connection.last_used >= CLIENT_POOL_HEALTH_CHECK_AFTER:
+                send_buffers(connection.sock, [u8(MSG_PING)])
+                connection.sock.settimeout(CLIENT_POOL_HEALTH_CHECK_AFTER)
+                try:
+                    return recv_u8(connection.sock) == MSG_PONG
+                finally:
+                    connection.sock.settimeout(None)
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def _prune_idle(self):
+        """Closes pooled connections idle for longer than idle_timeout. Caller holds the lock."""
+        now = time.monotonic()
+        expired = [c for c in self._idle if now - c.last_used > self.idle_timeout]
+        if expired:
+            self._idle = [c for c in self._idle if c not in expired]
+            self._open_count -= len(expired)
+            for connection in expired:
+                connection.close()
+            self._pool_lock.notify(len(expired))
+
+    def _acquire(self):
+        """
+        Borrows a connection: a healthy idle one if available, otherwise a new
+        one if the pool is below max_pool_size, otherwise waits for a release.
+        If the server answers a new connection with "busy, retry after", we back
+        off, but still take any connection another thread releases meanwhile.
+
+        Returns:
+            tuple[_PooledConnection, bool]: The connection and whether it was reused.
+
+        Raises:
+            ServerBusyError: If the server stayed busy for CLIENT_BUSY_MAX_RETRIES retries.
+        """
+        busy_attempts = 0
+        retry_at = 0  # No new connections before this time after a busy answer
+        while True:
+            with self._pool_lock:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Client is closed")
+                    self._prune_idle()
+                    if self._idle:
+                        connection = self._idle.pop()
+                        break
+                    now = time.monotonic()
+                    if self._open_count < self.max_pool_size and now >= retry_at:
+                        self._open_count += 1
+                        connection = None
+                        break
+                    self._pool_lock.wait(retry_at - now if now < retry_at else None)
+
+            if connection is None:
+                try:
+                    return self._connect(), False
+                except ServerBusyError as e:
+                    self._discard(None)
+                    if busy_attempts == CLIENT_BUSY_MAX_RETRIES:
+                        raise
+                    delay = self._busy_delay(busy_attempts, e.retry_after)
+                    busy_attempts += 1
+                    print(f"[*] Server busy; retrying in {delay:.1f}s.")
+                    retry_at = time.monotonic() + delay
+                    continue
+                except BaseException:
+                    self._discard(None)
+                    raise
+            if self._is_healthy(connection):
+                return connection, True
+            self._discard(connection)
+
+    def _release(self, connection):
+        """Returns a connection to the pool after a successful send."""
+        connection.last_used = time.monotonic()
+        with self._pool_lock:
+            if self._closed:
+                self._open_count -= 1
+                connection.close()
+            else:
+                self._idle.append(connection)
+            self._pool_lock.notify()
+
+    def _discard(self, connection):
+        """Drops a broken connection (or a failed connection attempt) from the pool."""
+        if connection is not None:
+            connection.sock.close()
+        with self._pool_lock:
+            self._open_count -= 1
+            self._pool_lock.notify()
+
+    def _prepare_file(self, connection, name, file_data):
+        """
+        Encrypts one file for MSG_FILE with the connection's suite.
+
+        Returns:
+            tuple: (message type, message body buffers, SHA-256 digest of the ciphertext).
+        """
+        suite = connection.suite
+        # Fresh symmetric key per file, encrypted with the agreed suite
+        file_key = suite.generate_key()
+        encrypted_file = suite.encrypt(file_data, file_key)
+
+        # Encrypt the file key using the server's RSA public key
+        # This ensures only the server (with its private key) can decrypt the file key
+        encrypted_key = rsa_encrypt(file_key, self.public_key)
+
+        # Filename length (4 bytes) + filename, encrypted file key length (4 bytes) + key,
+        # encrypted file length (8 bytes) + encrypted file data.
+        body = [
+            u32(len(name)), name,
+            u32(len(encrypted_key)), encrypted_key,
+            u64(len(encrypted_file)), encrypted_file,
+        ]
+        return MSG_FILE, body, hashlib.sha256(encrypted_file).digest()
+
+    def _prepare_pack(self, connection, container):
+        """Encrypts one packed container for MSG_PACK; returns the same triple as _prepare_file."""
+        suite = connection.suite
+        # One key, one RSA wrap and one IV/tag for the whole container
+        pack_key = suite.generate_key()
+        encrypted_pack = suite.encrypt(container, pack_key)
+        encrypted_key = rsa_encrypt(pack_key, self.public_key)
+
+        # Encrypted key length (4 bytes) + key, encrypted container length (8 bytes) + container.
+        body = [
+            u32(len(encrypted_key)), encrypted_key,
+            u64(len(encrypted_pack)), encrypted_pack,
+        ]
+        return MSG_PACK, body, hashlib.sha256(encrypted_pack).digest()
+
+    def _file_upload(self, filename, read_data):
+        """An upload of one file whose content `read_data()` returns when it is (re)sent."""
+        name = filename.encode('utf-8')
+        return _Upload(filename, 1, lambda connection: self._prepare_file(connection, name, read_data()))
+
+    def _read_ack(self, connection, sequence, digest):
+        """
+        Reads the server's acknowledgement of the upload sent as `sequence`.
+
+        Returns:
+            str: None if the upload was saved, otherwise the reason it was not.
+        """
+        sock = connection.sock
+        sock.settimeout(CLIENT_ACK_TIMEOUT)
+        try:
+            if recv_u8(sock) != MSG_ACK:
+                raise ConnectionError("Expected an upload acknowledgement from the server")
+            acked_sequence = recv_u32(sock)
+            status = recv_u8(sock)
+            server_digest = bytes(recv_exactly(sock, DIGEST_SIZE))
+            reason = recv_exactly(sock, recv_u16(sock)).decode('utf-8', 'replace')
+        finally:
+            sock.settimeout(None)
+        if acked_sequence != sequence:
+            raise ConnectionError(f"Acknowledgement for upload {acked_sequence} arrived while expecting {sequence}")
+        if status != STATUS_OK:
+            return reason or "rejected by the server"
+        if server_digest != digest:
+            return "server received different data (digest mismatch)"
+        return None
+
+    def _pipeline_on(self, connection, batch, window):
+        """
+        Sends a batch's uploads on one connection without waiting for each
+        acknowledgement: up to `window` uploads are in flight, and the acks,
+        which the server sends in order, are matched as they arrive. Uploads
+        leave `batch.pending` only once acknowledged, so if the connection
+        fails a retry resends exactly the uploads the server has not confirmed.
+        """
+        in_flight = collections.deque()  # (sequence, digest) of the first uploads in batch.pending
+        while True:
+            if len(in_flight) < window:
+                if len(in_flight) == len(batch.pending):
+                    upload = next(batch.source, None)
+                    if upload is not None:
+                        batch.pending.append(upload)
+                if len(in_flight) < len(batch.pending):
+                    upload = batch.pending[len(in_flight)]
+                    try:
+                        message_type, body, digest = upload.prepare(connection)
+                    except OSError as e:
+                        # A file that cannot be read is that upload's failure; the
+                        # connection is fine and may still have acks in flight
+                        del batch.pending[len(in_flight)]
+                        batch.failures.append((upload.label, f"could not be read: {e}"))
+                        continue
+                    sequence = connection.next_sequence
+                    connection.next_sequence = (sequence + 1) % (1 << 32)
+                    # Message type (1 byte) and sequence number (4 bytes), then the body, in one write
+                    send_buffers(connection.sock, [u8(message_type), u32(sequence)] + body)
+                    in_flight.append((sequence, digest))
+                    continue
+            if not in_flight:
+                return
+            # Window full or nothing left to send: wait for the oldest acknowledgement
+            sequence, digest = in_flight.popleft()
+            reason = self._read_ack(connection, sequence, digest)
+            upload = batch.pending.popleft()
+            if reason is None:
+                batch.saved += upload.file_count
+            else:
+                batch.failures.append((upload.label, reason))
+
+    def _send_uploads(self, uploads, window=CLIENT_ACK_WINDOW):
+        """
+        Sends uploads pipelined on one pooled connection and waits until the
+        server has acknowledged all of them.
+
+        Returns:
+            int: The number of files the server confirmed as saved.
+
+        Raises:
+            TransferRejectedError: If some of them could not be prepared or saved.
+        """
+        batch = _UploadBatch(uploads)
+        self._run_on_connection(lambda connection: self._pipeline_on(connection, batch, max(1, window)))
+        if batch.failures:
+            raise TransferRejectedError(batch.failures, batch.saved)
+        return batch.saved
+
+    def send_file(self, file_path):
+        """
+        Encrypts and sends one file over a pooled connection and waits for the
+        server to confirm it was saved.
+
+        Args:
+            file_path (str): The path to the file to be sent.
+
+        Raises:
+            OSError: If the file cannot be read or the server cannot be reached.
+            TransferRejectedError: If the server could not save the file.
+        """
+        with open(file_path, 'rb') as f:
+            file_data = f.read()
+        # Get the original filename from the file_path
+        self.send_data(os.path.basename(file_path), file_data)
+
+    def _run_on_connection(self, exchange):
+        """
+        Runs `exchange(connection)` on a pooled connection and returns its result.
+        The server may have dropped a reused connection between the health check
+        and our write, so a failure there is retried once on a fresh connection.
+        """
+        if self.public_key is None:
+            raise RuntimeError("Server public key is missing")
+
+        connection, reused = self._acquire()
+        try:
+            result = exchange(connection)
+        except OSError:
+            self._discard(connection)
+            if not reused:
+                raise
+            connection, _ = self._acquire()
+            try:
+                result = exchange(connection)
+            except BaseException:
+                self._discard(connection)
+                raise
+        except BaseException:
+            self._discard(connection)
+            raise
+        self._release(connection)
+        return result
+
+    def send_data(self, filename, file_data):
+        """
+        Encrypts and sends in-memory data as a file named `filename`, and waits
+        for the server to confirm it was saved.
+
+        Args:
+            filename (str): The name the server saves the data under.
+            file_data (bytes): The file content.
+
+        Raises:
+            TransferRejectedError: If the server could not save the file.
+        """
+        self._send_uploads([self._file_upload(filename, lambda: file_data)])
+
+    def send_files(self, file_paths, window=CLIENT_ACK_WINDOW):
+        """
+        Sends several files one by one, keeping up to `window` of them in
+        flight instead of waiting a round trip for each acknowledgement.
+        Files are read when they are sent, so at most `window` are held in memory.
+
+        Args:
+            file_paths (iterable[str]): The paths of the files to be sent.
+            window (int): Maximum number of unacknowledged files.
+
+        Returns:
+            int: The number of files the server confirmed as saved.
+
+        Raises:
+            TransferRejectedError: If some of the files could not be read or saved.
+        """
+        return self._send_uploads((self._file_upload(os.path.basename(file_path), _file_reader(file_path))
+                                   for file_path in file_paths), window)
+
+    def _pack_uploads(self, entries, max_pack_bytes):
+        """Groups (filename, file data) pairs into container uploads of up to `max_pack_bytes`."""
+        batch = []
+        batch_bytes = 4
+        for filename, file_data in entries:
+            name = filename.encode('utf-8')
+            entry_bytes = PACK_ENTRY_OVERHEAD + len(name) + len(file_data)
+            if batch and batch_bytes + entry_bytes > max_pack_bytes:
+                yield self._pack_upload(batch)
+                batch = []
+                batch_bytes = 4
+            batch.append((name, file_data))
+            batch_bytes += entry_bytes
+        if batch:
+            yield self._pack_upload(batch)
+
+    def _pack_upload(self, batch):
+        container = build_pack(batch)
+        label = f"container of {len(batch)} files"
+        return _Upload(label, len(batch), lambda connection: self._prepare_pack(connection, container))
+
+    def send_packed(self, entries, max_pack_bytes=PACK_MAX_BYTES, window=CLIENT_ACK_WINDOW):
+        """
+        Sends many small files as packed containers of up to `max_pack_bytes`
+        each. Every container pays the per-message costs (key wrap, IV and
+        padding, headers) once for all the files in it; the server unpacks it
+        and writes the files out together. Containers are pipelined like
+        send_files() does with files.
+
+        Args:
+            entries (iterable): (filename, file data) pairs; consumed lazily.
+            max_pack_bytes (int): Maximum plaintext size of one container.
+            window (int): Maximum number of unacknowledged containers.
+
+        Returns:
+            int: The number of files the server confirmed as saved.
+
+        Raises:
+            TransferRejectedError: If the server could not save some containers.
+        """
+        return self._send_uploads(self._pack_uploads(entries, max_pack_bytes), window)
+
+    def send_files_packed(self, file_paths, window=CLIENT_ACK_WINDOW):
+        """
+        Sends several files, packing those up to PACK_FILE_THRESHOLD bytes into
+        shared containers and sending larger ones on their own, all in one pipeline.
+
+        Args:
+            file_paths (iterable[str]): The paths of the files to be sent.
+            window (int): Maximum number of unacknowledged uploads.
+
+        Returns:
+            int: The number of files the server confirmed as saved.
+
+        Raises:
+            TransferRejectedError: If some of the files could not be read or saved.
+        """
+        large_files = []
+
+        def small_files():
+            for file_path in file_paths:
+                try:
+                    if os.path.getsize(file_path) > PACK_FILE_THRESHOLD:
+                        large_files.append(file_path)
+                        continue
+                    with open(file_path, 'rb') as f:
+                        file_data = f.read()
+                except OSError:
+                    # Sent on its own instead, where the read fails again and is reported for this file
+                    large_files.append(file_path)
+                    continue
+                yield os.path.basename(file_path), file_data
+
+        def large_file_uploads():
+            for file_path in large_files:
+                yield self._file_upload(os.path.basename(file_path), _file_reader(file_path))
+
+        uploads = itertools.chain(self._pack_uploads(small_files(), PACK_MAX_BYTES), large_file_uploads())
+        return self._send_uploads(uploads, window)
+
+    def stat(self, filename):
+        """
+        Returns the size of a file in the server's save directory.
+
+        Raises:
+            FileNotFoundError: If the server has no such file.
+        """
+        return self._stat(filename)[0]
+
+    def _stat(self, filename):
+        """Returns the size and version of a file in the server's save directory."""
+        name = filename.encode('utf-8')
+
+        def exchange(connection):
+            send_buffers(connection.sock, [u8(MSG_STAT), u32(len(name)), name])
+            return recv_u8(connection.sock), recv_u64(connection.sock), recv_u64(connection.sock)
+
+        status, size, version = self._run_on_connection(exchange)
+        if status == STATUS_NOT_FOUND:
+            raise FileNotFoundError(f"Server has no file named '{filename}'")
+        if status != STATUS_OK:
+            raise ValueError(f"Server refused to stat '{filename}'")
+        return size, version
+
+    def _fetch_range_on(self, connection, name, offset, length, version, part_path):
+        """
+        Requests bytes [offset, offset + length) of the given version of a file
+        and writes them, decrypted chunk by chunk, at the same offsets of `part_path`.
+
+        Returns:
+            int: The request status (STATUS_OK if the range was written).
+        """
+        suite = connection.suite
+        # Fresh session key for the response, readable only by the server
+        session_key = suite.generate_key()
+        encrypted_key = rsa_encrypt(session_key, self.public_key)
+        send_buffers(connection.sock, [
+            u8(MSG_DOWNLOAD),
+            u32(len(name)), name,
+            u64(offset), u64(length), u64(version),
+            u32(len(encrypted_key)), encrypted_key,
+        ])
+
+        status = recv_u8(connection.sock)
+        recv_u64(connection.sock)  # Total file size
+        served = recv_u64(connection.sock)
+        recv_u64(connection.sock)  # Current version
+        if status != STATUS_OK:
+            return status
+        if served != length:
+            raise ValueError(f"Server served {served} of {length} requested bytes; the file changed")
+
+        with open(part_path, 'r+b') as f:
+            f.seek(offset)
+            position = offset
+            while position < offset + length:
+                chunk_length = recv_u32(connection.sock)
+                chunk = suite.decrypt(recv_exactly(connection.sock, chunk_length, CHUNK_SIZE), session_key)
+                if int.from_bytes(chunk[:8], 'big') != position:
+                    raise ValueError("Download chunk arrived out of order")
+                f.write(memoryview(chunk)[8:])
+                position += len(chunk) - 8
+        return STATUS_OK
+
+    def _fetch_range(self, filename, offset, length, version, part_path):
+        name = filename.encode('utf-8')
+        status = self._run_on_connection(
+            lambda connection: self._fetch_range_on(connection, name, offset, length, version, part_path))
+        if status == STATUS_CHANGED:
+            raise FileChangedError(f"'{filename}' was replaced on the server during the download")
+        if status == STATUS_NOT_FOUND:
+            raise FileNotFoundError(f"Server has no file named '{filename}'")
+        if status != STATUS_OK:
+            raise ValueError(f"Server refused to send '{filename}'")
+
+    def download_file(self, filename, destination_directory, parallel=DOWNLOAD_PARALLEL_RANGES,
+                      range_size=DOWNLOAD_RANGE_SIZE):
+        """
+        Downloads a file from the server's save directory. The destination is
+        preallocated as '<name>.part' and split into ranges of `range_size`
+        bytes that are fetched in parallel, each on its own pooled connection,
+        and decrypted straight into place. Finished ranges are recorded in
+        '<name>.part.json' together with the file's version on the server, so an
+        interrupted download resumes where it stopped unless the file has been
+        replaced since.
+
+        Args:
+            filename (str): The name of the file on the server.
+            destination_directory (str): Where to save the file.
+            parallel (int): Maximum number of ranges fetched concurrently.
+            range_size (int): Bytes per range.
+
+        Returns:
+            str: The path of the downloaded file.
+
+        Raises:
+            FileChangedError: If the file was replaced on the server mid-download.
+                The partial download is discarded; calling again starts over.
+        """
+        size, version = self._stat(filename)
+        destination = os.path.join(destination_directory, os.path.basename(filename))
+        part_path = destination + '.part'
+        progress_path = part_path + '.json'
+
+        # Resume only if the earlier attempt fetched the same version with the same range grid
+        done = set()
+        try:
+            with open(progress_path, 'r', encoding='utf-8') as f:
+                progress = json.load(f)
+            if progress.get("version") == version and progress.get("size") == size \
+                    and progress.get("range_size") == range_size and os.path.getsize(part_path) == size:
+                done = set(progress.get("done", []))
+        except (OSError, ValueError):
+            pass
+
+        os.makedirs(destination_directory or '.', exist_ok=True)
+        if not done:
+            # Preallocate, so every range can be written at its offset from any thread
+            with open(part_path, 'wb') as f:
+                f.truncate(size)
+        pending = [start for start in range(0, size, range_size) if start not in done]
+        if done:
+            print(f"[*] Resuming '{filename}': {len(done)} of {len(done) + len(pending)} ranges already downloaded.")
+
+        progress_lock = threading.Lock()
+
+        def fetch(start):
+            self._fetch_range(filename, start, min(range_size, size - start), version, part_path)
+            with progress_lock:
+                done.add(start)
+                temp_path = progress_path + '.tmp'
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump({"version": version, "size": size, "range_size": range_size, "done": sorted(done)}, f)
+                os.replace(temp_path, progress_path)
+
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+                futures = [executor.submit(fetch, start) for start in pending]
+                try:
+                    for future in futures:
+                        future.result()
+                except BaseException:
+                    for future in futures:
+                        future.cancel()  # Ranges not started yet; the download fails anyway
+                    raise
+        except FileChangedError:
+            # The ranges already written belong to the old version
+            for path in (progress_path, part_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+
+        os.replace(part_path, destination)
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+        return destination
+
+    def close(self):
+        """Closes all idle connections; connections in use are closed when released."""
+        with self._pool_lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open_count -= len(idle)
+            self._pool_lock.notify_all()
+        for connection in idle:
+            connection.close()
+
+
+# Shared client used by the module-level send_file(), created on first use
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    """Returns the shared FileTransferClient, creating it on first use."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = FileTransferClient()
+        return _default_client
+
+
+def close_connections():
+    """Closes the shared client's pooled connections (e.g. when the application exits)."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is not None:
+            _default_client.close()
+            _default_client = None
+
+
 def send_file(file_path):
     """
-    Sends a specified file to the server after encrypting it with AES,
-    and encrypting the AES key with the server's RSA public key.
-    It now also sends the original filename to the server.
+    Sends a specified file to the server after encrypting it with the
+    negotiated cipher suite, and encrypting the file key with the server's
+    RSA public key. It also sends the original filename to the server.
+    Connections are pooled, so repeated sends reuse a warm connection.
 
     Args:
         file_path (str): The path to the file to be sent.
@@ -42,49 +829,72 @@ def send_file(file_path):
         return
 
     try:
-        with open(file_path, 'rb') as f:
-            file_data = f.read()
+        get_default_client().send_file(file_path)
+        print(f"[+] File '{os.path.basename(file_path)}' sent and confirmed saved by the server.")
 
-        # Get the original filename from the file_path
-        original_filename = os.path.basename(file_path).encode('utf-8')
+    except TransferRejectedError as e:
+        print(f"[!] {e}")
+    except ConnectionRefusedError:
+        print("[!] Error: Connection to server refused. Make sure the server is running and accessible.")
+    except Exception as e:
+        print(f"[!] An error occurred while sending the file: {e}")
 
-        # Generate AES key for symmetric encryption of the file
-        aes_key = generate_aes_key()
-        # Encrypt the file data using the generated AES key
-        encrypted_file = encrypt_file(file_data, aes_key)
+def send_files_packed(file_paths):
+    """
+    Sends several files at once, packing small files into shared encrypted
+    containers. See FileTransferClient.send_files_packed.
 
-        # Encrypt the AES key using the server's RSA public key
-        # This ensures only the server (with its private key) can decrypt the AES key
-        encrypted_key = rsa_encrypt(aes_key, server_public_key)
+    Args:
+        file_paths (list[str]): The paths of the files to be sent.
+    """
+    print(f"[*] client.send_files_packed received {len(file_paths)} files.")
 
-        # Establish a socket connection to the server
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
-            client_socket.connect((SERVER_HOST, SERVER_PORT))
-            print(f"[*] Connected to server at {SERVER_HOST}:{SERVER_PORT}.")
+    if server_public_key is None:
+        print("[!] Cannot send files: Server public key is missing.")
+        return
 
-            # Send the length of the original filename (4 bytes)
-            client_socket.send(len(original_filename).to_bytes(4, 'big'))
-            # Send the original filename
-            client_socket.send(original_filename)
-            print(f"[+] Original filename '{original_filename.decode()}' sent.")
+    missing = [file_path for file_path in file_paths if not os.path.exists(file_path)]
+    if missing:
+        print(f"[!] Error: File not found at '{missing[0]}'.")
+        return
 
-            # Send the length of the encrypted AES key (4 bytes)
-            client_socket.send(len(encrypted_key).to_bytes(4, 'big'))
-            # Send the encrypted AES key
-            client_socket.send(encrypted_key)
-            print("[+] Encrypted AES key sent.")
+    try:
+        sent = get_default_client().send_files_packed(file_paths)
+        print(f"[+] {sent} files sent and confirmed saved by the server.")
 
-            # Send the length of the encrypted file (8 bytes)
-            client_socket.send(len(encrypted_file).to_bytes(8, 'big'))
-            # Send the encrypted file data. Use sendall for large files.
-            client_socket.sendall(encrypted_file)
+    except TransferRejectedError as e:
+        print(f"[!] {e.saved} files saved. {e}")
+    except ConnectionRefusedError:
+        print("[!] Error: Connection to server refused. Make sure the server is running and accessible.")
+    except Exception as e:
+        print(f"[!] An error occurred while sending the files: {e}")
 
-            print(f"[+] File '{os.path.basename(file_path)}' and AES key sent successfully.")
+def download_file(filename, destination_directory):
+    """
+    Downloads a file from the server's save directory into `destination_directory`,
+    fetching byte ranges in parallel and resuming an earlier interrupted attempt.
+    See FileTransferClient.download_file.
+
+    Args:
+        filename (str): The name of the file on the server.
+        destination_directory (str): Where to save the file.
+    """
+    print(f"[*] client.download_file requested: '{filename}'")
+
+    if server_public_key is None:
+        print("[!] Cannot download file: Server public key is missing.")
+        return
+
+    try:
+        destination = get_default_client().download_file(filename, destination_directory)
+        print(f"[+] File '{filename}' downloaded to '{destination}'.")
 
     except ConnectionRefusedError:
         print("[!] Error: Connection to server refused. Make sure the server is running and accessible.")
+    except FileNotFoundError as e:
+        print(f"[!] Error: {e}")
     except Exception as e:
-        print(f"[!] An error occurred while sending the file: {e}")
+        print(f"[!] An error occurred while downloading the file: {e}")
 
 # This block is for testing the client script directly, without the GUI.
 # It creates a dummy file if it doesn't exist and attempts to send it.
@@ -96,6 +906,7 @@ def start_client_dummy_send():
             f.write("It demonstrates the file sending functionality.\n")
     print(f"[*] Attempting to send dummy file: '{dummy_file_path}'")
     send_file(dummy_file_path)
+    close_connections()
 
 if __name__ == "__main__":
     # If client.py is run directly, it will attempt to send a dummy file.
@@ -2,6 +2,70 @@
 
 SERVER_HOST = '127.0.0.1'
 SERVER_PORT = 9999
-BUFFER_SIZE = 4096
 
 SERVER_PUBLIC_KEY_PATH = 'server_public.pem'
+
+# Cached results of the cipher-suite startup micro-benchmark
+CIPHER_BENCHMARK_CACHE = 'cipher_benchmark.json'
+
+# Client connection pool
+CLIENT_POOL_MAX_SIZE = 4            # Maximum open connections per client
+CLIENT_POOL_IDLE_TIMEOUT = 30       # Seconds an idle pooled connection is kept open
+CLIENT_POOL_HEALTH_CHECK_AFTER = 5  # Idle seconds after which a connection is pinged before reuse
+
+# Upload acknowledgements: the client keeps up to CLIENT_ACK_WINDOW uploads per
+# connection in flight, without waiting for each one's acknowledgement
+CLIENT_ACK_WINDOW = 8
+CLIENT_ACK_TIMEOUT = 120  # Seconds to wait for the server to acknowledge an upload
+
+# Server closes keep-alive connections that stay idle for longer than this (seconds).
+# Keep it above CLIENT_POOL_IDLE_TIMEOUT so the client normally closes first.
+SERVER_IDLE_TIMEOUT = 60
+
+# Transport tuning, shared by client and server
+CHUNK_SIZE = 256 * 1024            # Bytes per recv_into() when adaptive chunking is off
+SOCKET_RCVBUF = 0                  # SO_RCVBUF in bytes; 0 keeps the OS default (and Linux autotuning)
+SOCKET_SNDBUF = 0                  # SO_SNDBUF in bytes; 0 keeps the OS default
+ADAPTIVE_CHUNKING = True           # Grow/shrink the read size per connection from measured throughput
+ADAPTIVE_MIN_CHUNK = 16 * 1024
+ADAPTIVE_MAX_CHUNK = 4 * 1024 * 1024
+
+# Server processes. With more than one, a supervisor runs that many worker
+# processes bound to the same port with SO_REUSEPORT (Linux, BSD, macOS).
+SERVER_WORKERS = 1
+SERVER_WORKER_START_TIMEOUT = 30  # Seconds for all workers to start listening
+
+# Server shutdown. stop_server() wakes the server at once: idle connections
+# close immediately, and transfers in progress get this long to finish
+# before their connections are cut.
+SERVER_DRAIN_TIMEOUT = 10
+
+# Server admission control
+SERVER_MEMORY_BUDGET = 256 * 1024 * 1024  # In-flight upload bytes the server may buffer in memory (split across workers)
+SERVER_MAX_CONNECTIONS_PER_CLIENT = 8     # Concurrent connections per client address (per worker)
+ADMISSION_DEFER_TIMEOUT = 2.0             # Seconds an upload waits for memory budget before spilling
+SERVER_SPILL_TO_DISK = True               # Stream uploads that don't fit through a temp file (else keep waiting)
+SERVER_BUSY_RETRY_AFTER = 1.0             # Seconds rejected clients are told to wait before retrying
+SERVER_MAX_NAME_BYTES = 4096              # Longest filename a client may send (UTF-8 bytes)
+SERVER_MAX_KEY_BYTES = 1024               # Longest RSA-wrapped key a client may send
+
+# Client backoff when the server answers "busy, retry after"
+CLIENT_BUSY_MAX_RETRIES = 5
+CLIENT_BUSY_MAX_BACKOFF = 30  # Seconds
+
+# Small-file packing
+PACK_MAX_BYTES = 8 * 1024 * 1024          # Client: maximum plaintext size of one packed container
+PACK_FILE_THRESHOLD = 64 * 1024           # Client: files up to this size are packed, larger ones sent alone
+SERVER_MAX_PACK_BYTES = 64 * 1024 * 1024  # Server: larger containers are refused
+
+# Downloads
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024        # Plaintext bytes per encrypted chunk streamed by the server
+DOWNLOAD_RANGE_SIZE = 16 * 1024 * 1024   # Client-side unit of parallel fetching and resume
+DOWNLOAD_PARALLEL_RANGES = 4             # Ranges fetched concurrently (each on its own pooled connection)
+
+# How the server keeps uploads: 'plaintext' decrypts them on receipt; 'encrypted'
+# stores the ciphertext as received and decrypts on first read (see storage.py).
+# Packed containers are always unpacked, and so decrypted, on receipt.
+STORAGE_MODE = 'plaintext'
+STORAGE_KEY_FILE = 'server_storage.key'  # Local key that wraps stored file keys
+STORAGE_CACHE_TTL = 300                  # Seconds decrypted plaintext stays cached after its last read
@@ -1,10 +1,26 @@
-from Crypto.Cipher import AES, PKCS1_OAEP
+import Crypto
+from Crypto.Cipher import AES, ChaCha20_Poly1305, PKCS1_OAEP
 from Crypto.PublicKey import RSA
 from Crypto.Random import get_random_bytes
+import functools
+import json
 import os
+import platform
+import time
+
+from config import CIPHER_BENCHMARK_CACHE
+from Interfaces.Icryptoutils import ICipherSuite
 
 AES_KEY_SIZE = 32  # 256 bits
 BLOCK_SIZE = AES.block_size
+GCM_NONCE_SIZE = 12
+CHACHA_NONCE_SIZE = 12
+TAG_SIZE = 16
+
+# Micro-benchmark parameters: each suite encrypts and decrypts a random sample
+# for roughly BENCHMARK_DURATION seconds.
+BENCHMARK_SAMPLE_SIZE = 256 * 1024
+BENCHMARK_DURATION = 0.05
 
 
 def pad(data):
@@ -17,6 +33,14 @@ def unpad(data):
     return data[:-padding_len]
 
 
+def _checked_unpad(data):
+    """Removes PKCS#7 padding; malformed padding (a wrong key or tampered data) raises ValueError."""
+    padding_len = data[-1] if data else 0
+    if not 1 <= padding_len <= BLOCK_SIZE or data[-padding_len:] != bytes([padding_len]) * padding_len:
+        raise ValueError("Invalid AES-CBC padding")
+    return data[:-padding_len]
+
+
 def generate_aes_key():
     return get_random_bytes(AES_KEY_SIZE)
 
@@ -54,13 +78,276 @@ def generate_rsa_keys():
     return private_key, public_key
 
 
+@functools.lru_cache(maxsize=8)
+def _import_rsa_key(key_bytes):
+    # Parsing (and validating) a PEM private key costs far more than the
+    # RSA operation itself, so each distinct key is only imported once.
+    return RSA.import_key(key_bytes)
+
+
 def rsa_encrypt(data, public_key_bytes):
-    public_key = RSA.import_key(public_key_bytes)
+    public_key = _import_rsa_key(public_key_bytes)
     cipher_rsa = PKCS1_OAEP.new(public_key)
     return cipher_rsa.encrypt(data)
 
 
 def rsa_decrypt(encrypted_data, private_key_bytes):
-    private_key = RSA.import_key(private_key_bytes)
+    private_key = _import_rsa_key(private_key_bytes)
     cipher_rsa = PKCS1_OAEP.new(private_key)
     return cipher_rsa.decrypt(encrypted_data)
+
+
+class _CBCDecryptor:
+    """Incremental AES-CBC decryption; holds back the last block for unpadding."""
+
+    def __init__(self, key):
+        self._key = key
+        self._cipher = None
+        self._pending = bytearray()
+
+    def update(self, data):
+        self._pending += data
+        if self._cipher is None:
+            if len(self._pending) < BLOCK_SIZE:
+                return b''
+            self._cipher = AES.new(self._key, AES.MODE_CBC, bytes(self._pending[:BLOCK_SIZE]))
+            del self._pending[:BLOCK_SIZE]
+        usable = (len(self._pending) - 1) // BLOCK_SIZE * BLOCK_SIZE
+        if usable <= 0:
+            return b''
+        plaintext = self._cipher.decrypt(bytes(self._pending[:usable]))
+        del self._pending[:usable]
+        return plaintext
+
+    def finalize(self):
+        if self._cipher is None or len(self._pending) != BLOCK_SIZE:
+            raise ValueError("Truncated AES-CBC ciphertext")
+        return _checked_unpad(self._cipher.decrypt(bytes(self._pending)))
+
+
+class _AEADDecryptor:
+    """Incremental nonce + ciphertext + tag decryption; the tag is verified in finalize()."""
+
+    def __init__(self, new_cipher, nonce_size):
+        self._new_cipher = new_cipher
+        self._nonce_size = nonce_size
+        self._cipher = None
+        self._pending = bytearray()
+
+    def update(self, data):
+        self._pending += data
+        if self._cipher is None:
+            if len(self._pending) < self._nonce_size:
+                return b''
+            self._cipher = self._new_cipher(bytes(self._pending[:self._nonce_size]))
+            del self._pending[:self._nonce_size]
+        usable = len(self._pending) - TAG_SIZE
+        if usable <= 0:
+            return b''
+        plaintext = self._cipher.decrypt(bytes(self._pending[:usable]))
+        del self._pending[:usable]
+        return plaintext
+
+    def finalize(self):
+        if self._cipher is None or len(self._pending) != TAG_SIZE:
+            raise ValueError("Truncated authenticated ciphertext")
+        self._cipher.verify(bytes(self._pending))
+        return b''
+
+
+class AES256CBCSuite(ICipherSuite):
+    """The original AES-256-CBC suite: IV + PKCS#7 padded ciphertext."""
+    name = 'AES-256-CBC'
+    key_size = AES_KEY_SIZE
+
+    def generate_key(self):
+        return generate_aes_key()
+
+    def encrypt(self, data, key):
+        return encrypt_file(data, key)
+
+    def decrypt(self, encrypted_data, key):
+        # Checked like _CBCDecryptor.finalize(), so a file is accepted or rejected
+        # the same way whether it was buffered in memory or streamed
+        if len(encrypted_data) < 2 * BLOCK_SIZE or len(encrypted_data) % BLOCK_SIZE:
+            raise ValueError("Truncated AES-CBC ciphertext")
+        cipher = AES.new(key, AES.MODE_CBC, bytes(encrypted_data[:BLOCK_SIZE]))
+        return _checked_unpad(cipher.decrypt(encrypted_data[BLOCK_SIZE:]))
+
+    def decryptor(self, key):
+        return _CBCDecryptor(key)
+
+
+class AES256GCMSuite(ICipherSuite):
+    """AES-256-GCM: nonce + ciphertext + tag. Fastest where AES-NI is available."""
+    name = 'AES-256-GCM'
+    key_size = AES_KEY_SIZE
+
+    def generate_key(self):
+        return get_random_bytes(self.key_size)
+
+    def encrypt(self, data, key):
+        cipher = AES.new(key, AES.MODE_GCM, nonce=get_random_bytes(GCM_NONCE_SIZE))
+        ciphertext, tag = cipher.encrypt_and_digest(data)
+        return cipher.nonce + ciphertext + tag
+
+    def decrypt(self, encrypted_data, key):
+        nonce = encrypted_data[:GCM_NONCE_SIZE]
+        tag = encrypted_data[-TAG_SIZE:]
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+        return cipher.decrypt_and_verify(encrypted_data[GCM_NONCE_SIZE:-TAG_SIZE], tag)
+
+    def decryptor(self, key):
+        return _AEADDecryptor(lambda nonce: AES.new(key, AES.MODE_GCM, nonce=nonce), GCM_NONCE_SIZE)
+
+    def plaintext_size(self, ciphertext_size):
+        return ciphertext_size - GCM_NONCE_SIZE - TAG_SIZE
+
+
+class ChaCha20Poly1305Suite(ICipherSuite):
+    """ChaCha20-Poly1305: nonce + ciphertext + tag. Fastest on CPUs without AES acceleration."""
+    name = 'CHACHA20-POLY1305'
+    key_size = 32
+
+    def generate_key(self):
+        return get_random_bytes(self.key_size)
+
+    def encrypt(self, data, key):
+        cipher = ChaCha20_Poly1305.new(key=key, nonce=get_random_bytes(CHACHA_NONCE_SIZE))
+        ciphertext, tag = cipher.encrypt_and_digest(data)
+        return cipher.nonce + ciphertext + tag
+
+    def decrypt(self, encrypted_data, key):
+        nonce = encrypted_data[:CHACHA_NONCE_SIZE]
+        tag = encrypted_data[-TAG_SIZE:]
+        cipher = ChaCha20_Poly1305.new(key=key, nonce=nonce)
+        return cipher.decrypt_and_verify(encrypted_data[CHACHA_NONCE_SIZE:-TAG_SIZE], tag)
+
+    def decryptor(self, key):
+        return _AEADDecryptor(lambda nonce: ChaCha20_Poly1305.new(key=key, nonce=nonce), CHACHA_NONCE_SIZE)
+
+    def plaintext_size(self, ciphertext_size):
+        return ciphertext_size - CHACHA_NONCE_SIZE - TAG_SIZE
+
+
+# Registry of available suites, keyed by wire name.
+_cipher_suites = {}
+# Cached local ranking (fastest first); computed lazily by preferred_cipher_suites().
+_preferred_suites = None
+
+
+def register_cipher_suite(suite):
+    """
+    Registers a cipher suite so it can be advertised and negotiated.
+    Registering a suite invalidates the in-memory ranking; the on-disk
+    benchmark cache is refreshed automatically when it lacks the new suite.
+    """
+    global _preferred_suites
+    if not suite.name or len(suite.name.encode('ascii')) > 255:
+        raise ValueError("Cipher suite name must be 1-255 ASCII characters")
+    _cipher_suites[suite.name] = suite
+    _preferred_suites = None
+
+
+def get_cipher_suite(name):
+    try:
+        return _cipher_suites[name]
+    except KeyError:
+        raise ValueError(f"Unknown cipher suite: {name}")
+
+
+def supported_cipher_suites():
+    return list(_cipher_suites)
+
+
+def benchmark_cipher_suites(sample_size=BENCHMARK_SAMPLE_SIZE, duration=BENCHMARK_DURATION):
+    """
+    Measures the local encrypt+decrypt throughput of every registered suite.
+
+    Returns:
+        dict: Suite name -> throughput in bytes per second.
+    """
+    sample = get_random_bytes(sample_size)
+    results = {}
+    for name, suite in _cipher_suites.items():
+        key = suite.generate_key()
+        processed = 0
+        start = time.perf_counter()
+        while True:
+            suite.decrypt(suite.encrypt(sample, key), key)
+            processed += sample_size
+            elapsed = time.perf_counter() - start
+            if elapsed >= duration:
+                break
+        results[name] = processed / elapsed
+    return results
+
+
+def _benchmark_fingerprint():
+    # Results are only reused on the same machine and crypto library version.
+    return {
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "pycryptodome": Crypto.__version__,
+    }
+
+
+def _load_benchmark_cache(cache_path):
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cache.get("fingerprint") != _benchmark_fingerprint():
+        return None
+    results = cache.get("results", {})
+    if not all(name in results for name in _cipher_suites):
+        return None
+    return results
+
+
+def preferred_cipher_suites(cache_path=CIPHER_BENCHMARK_CACHE):
+    """
+    Returns registered suite names ranked by local throughput, fastest first.
+    The micro-benchmark runs once per machine; its results are cached in `cache_path`.
+    """
+    global _preferred_suites
+    if _preferred_suites is not None:
+        return list(_preferred_suites)
+
+    results = _load_benchmark_cache(cache_path)
+    if results is None:
+        results = benchmark_cipher_suites()
+        try:
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump({"fingerprint": _benchmark_fingerprint(), "results": results}, f, indent=2)
+        except OSError as e:
+            print(f"[!] Could not write cipher benchmark cache '{cache_path}': {e}")
+
+    _preferred_suites = sorted(_cipher_suites, key=lambda name: results[name], reverse=True)
+    return list(_preferred_suites)
+
+
+def negotiate_cipher_suite(offered):
+    """
+    Picks the suite both peers support with the best combined rank: the sum of
+    its position in the peer's preference list and in our own local ranking.
+    Ties go to our own ranking.
+
+    Args:
+        offered (list[str]): The peer's supported suites, in its preference order.
+
+    Returns:
+        str: The agreed suite name.
+    """
+    local = preferred_cipher_suites()
+    common = [name for name in local if name in offered]
+    if not common:
+        raise ValueError(f"No common cipher suite (offered: {', '.join(offered) or 'none'})")
+    return min(common, key=lambda name: (offered.index(name) + local.index(name), local.index(name)))
+
+
+register_cipher_suite(AES256GCMSuite())
+register_cipher_suite(ChaCha20Poly1305Suite())
+register_cipher_suite(AES256CBCSuite())
@@ -0,0 +1,334 @@
+# framing.py
+
+import socket
+import time
+
+from config import (
+    ADAPTIVE_MAX_CHUNK,
+    ADAPTIVE_MIN_CHUNK,
+    CHUNK_SIZE,
+    SOCKET_RCVBUF,
+    SOCKET_SNDBUF
+)
+
+# sendmsg() accepts at most IOV_MAX (usually 1024) buffers per call
+MAX_IOVECS = 1024
+
+# Message types (1 byte) that follow the cipher-suite handshake on a connection.
+# A connection carries any number of messages until MSG_CLOSE or EOF.
+MSG_CLOSE = 0  # Client is done with the connection
+MSG_FILE = 1   # Next file: sequence number, filename, encrypted file key, encrypted file data
+MSG_PING = 2   # Health check; answered with MSG_PONG
+MSG_PONG = 3
+MSG_PACK = 4   # Packed container of small files: sequence number, encrypted key, encrypted container
+MSG_STAT = 5   # Size and version of a file in the server's save directory
+MSG_DOWNLOAD = 6  # Byte range of one version of a file, streamed back as encrypted chunks
+MSG_ACK = 7    # Server's answer to each MSG_FILE/MSG_PACK, in order: sequence number,
+               # status, SHA-256 of the received ciphertext, u16-prefixed reason (empty on success)
+
+DIGEST_SIZE = 32  # SHA-256
+
+# Status byte in the server's answer to MSG_STAT, MSG_DOWNLOAD and uploads (MSG_ACK)
+STATUS_OK = 0
+STATUS_NOT_FOUND = 1
+STATUS_ERROR = 2
+STATUS_CHANGED = 3  # MSG_DOWNLOAD only: the file was replaced since the version the client asked for
+
+# Status byte that starts the server's handshake reply
+HELLO_OK = 0        # Followed by the agreed suite name (u8 length + name)
+HELLO_NO_SUITE = 1  # No common cipher suite; the server closes the connection
+HELLO_BUSY = 2      # Followed by u32 retry-after in milliseconds; the server closes the connection
+
+
+def set_nodelay(sock):
+    """
+    Disables Nagle's algorithm on a TCP socket. Every logical message is
+    written with a single coalesced send, so there is nothing to gain from
+    Nagle batching and a lot to lose from its interaction with delayed ACKs.
+    """
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except OSError:
+        pass  # Not a TCP socket (e.g. a socketpair in tests)
+
+
+def tune_socket(sock, rcvbuf=SOCKET_RCVBUF, sndbuf=SOCKET_SNDBUF):
+    """
+    Applies the configured SO_RCVBUF/SO_SNDBUF sizes (0 keeps the OS default).
+    For a server, call this on the listening socket before listen(): accepted
+    sockets inherit the buffers, and the TCP window scale is fixed during the
+    handshake, so setting them afterwards cannot open a larger window.
+    """
+    if rcvbuf:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    if sndbuf:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+
+
+class AdaptiveChunker:
+    """
+    Chooses the recv_into() size for one connection from what the last few
+    reads achieved. Every `window` reads it compares bytes received with bytes
+    requested and the resulting throughput:
+
+    - reads that keep filling the buffer mean data is already queued in the
+      kernel, so a larger read moves it with fewer syscalls: grow;
+    - if a grow made throughput worse, undo it and stop growing past that size;
+    - mostly empty reads mean the link is slower than we read: shrink, which
+      keeps per-connection buffers small.
+    """
+
+    GROW_FILL = 0.9
+    SHRINK_FILL = 0.25
+    # A grow is undone if throughput drops below this fraction of the previous window
+    REGRESSION = 0.9
+
+    def __init__(self, initial=CHUNK_SIZE, minimum=ADAPTIVE_MIN_CHUNK, maximum=ADAPTIVE_MAX_CHUNK, window=8):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.window = window
+        self.size = max(minimum, min(maximum, initial))
+        self.total_calls = 0
+        self.total_bytes = 0
+        self._limit = maximum
+        self._grew = False
+        self._last_throughput = None
+        self._reset_window()
+
+    def _reset_window(self):
+        self._calls = 0
+        self._received = 0
+        self._requested = 0
+        self._elapsed = 0.0
+
+    def record(self, requested, received, elapsed):
+        """
+        Records one recv_into() call and adjusts `size` at the end of each window.
+        `requested` is the chunk size in effect, even when the read was capped
+        by the end of the message.
+        """
+        self.total_calls += 1
+        self.total_bytes += received
+        self._calls += 1
+        self._received += received
+        self._requested += requested
+        self._elapsed += elapsed
+        if self._calls < self.window:
+            return
+
+        fill = self._received / self._requested
+        throughput = self._received / self._elapsed if self._elapsed > 0 else float('inf')
+        if self._grew and throughput < self._last_throughput * self.REGRESSION:
+            self.size = max(self.minimum, self.size // 2)
+            self._limit = self.size
+            self._grew = False
+        elif fill >= self.GROW_FILL and self.size < self._limit:
+            self.size = min(self._limit, self.size * 2)
+            self._grew = True
+        elif fill <= self.SHRINK_FILL and self.size > self.minimum:
+            self.size = max(self.minimum, self.size // 2)
+            self._limit = self.maximum
+            self._grew = False
+        else:
+            self._grew = False
+        self._last_throughput = throughput
+        self._reset_window()
+
+    def describe(self):
+        average = self.total_bytes / self.total_calls if self.total_calls else 0
+        return (f"chunk size {self.size // 1024} KiB, {self.total_calls} reads, "
+                f"{average / 1024:.1f} KiB per read")
+
+
+def u8(value):
+    return value.to_bytes(1, 'big')
+
+
+def u16(value):
+    return value.to_bytes(2, 'big')
+
+
+def u32(value):
+    return value.to_bytes(4, 'big')
+
+
+def u64(value):
+    return value.to_bytes(8, 'big')
+
+
+# A packed container (plaintext, encrypted as a whole) is a small tar-like archive:
+#   u32 entry count, then an index of (u16 name length, UTF-8 name, u64 data length)
+#   per entry, followed by all entry data in index order.
+PACK_ENTRY_OVERHEAD = 2 + 8
+
+
+def build_pack(entries):
+    """
+    Builds a packed container.
+
+    Args:
+        entries (list[tuple[bytes, bytes]]): (UTF-8 filename, file data) pairs.
+
+    Returns:
+        bytes: The container plaintext.
+    """
+    parts = [u32(len(entries))]
+    for name, data in entries:
+        parts += [u16(len(name)), name, u64(len(data))]
+    parts += [data for _, data in entries]
+    return b''.join(parts)
+
+
+def parse_pack(container):
+    """
+    Parses a packed container without copying file data.
+
+    Args:
+        container (bytes-like): The decrypted container.
+
+    Returns:
+        list[tuple[str, memoryview]]: (filename, file data) pairs.
+
+    Raises:
+        ValueError: If the index is truncated or does not match the data.
+    """
+    view = memoryview(container)
+    if len(view) < 4:
+        raise ValueError("Truncated pack header")
+    count = int.from_bytes(view[:4], 'big')
+    position = 4
+    index = []
+    for _ in range(count):
+        if position + 2 > len(view):
+            raise ValueError("Truncated pack index")
+        name_length = int.from_bytes(view[position:position + 2], 'big')
+        position += 2
+        if position + name_length + 8 > len(view):
+            raise ValueError("Truncated pack index")
+        name = bytes(view[position:position + name_length]).decode('utf-8')
+        position += name_length
+        index.append((name, int.from_bytes(view[position:position + 8], 'big')))
+        position += 8
+    if position + sum(size for _, size in index) != len(view):
+        raise ValueError("Pack index does not match its data")
+    entries = []
+    for name, size in index:
+        entries.append((name, view[position:position + size]))
+        position += size
+    return entries
+
+
+def recv_exactly(sock, size, chunk_size=None, chunker=None):
+    """
+    Receives exactly `size` bytes, reading straight into a preallocated buffer.
+
+    Args:
+        sock (socket.socket): The connected socket.
+        size (int): The number of bytes to receive.
+        chunk_size (int, optional): Upper bound for a single recv_into() call.
+        chunker (AdaptiveChunker, optional): Supplies (and learns) the read size instead of `chunk_size`.
+
+    Returns:
+        bytearray: The received bytes.
+
+    Raises:
+        ConnectionError: If the peer closes the connection before `size` bytes arrive.
+    """
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        want = size - received
+        if chunker is not None:
+            want = min(want, chunker.size)
+            started = time.perf_counter()
+            count = sock.recv_into(view[received:], want)
+            # Fill is measured against the chunk size, not the (possibly smaller) read:
+            # a read capped by the end of a small message says nothing in favour of growing
+            chunker.record(chunker.size, count, time.perf_counter() - started)
+        else:
+            if chunk_size:
+                want = min(want, chunk_size)
+            count = sock.recv_into(view[received:], want)
+        if count == 0:
+            raise ConnectionError(f"Connection closed after {received} of {size} bytes")
+        received += count
+    return buffer
+
+
+def discard_exactly(sock, size, chunk_size=CHUNK_SIZE):
+    """Reads and drops `size` bytes, e.g. the body of a message that is being rejected."""
+    buffer = bytearray(min(size, chunk_size))
+    view = memoryview(buffer)
+    remaining = size
+    while remaining:
+        count = sock.recv_into(view, min(remaining, len(buffer)))
+        if count == 0:
+            raise ConnectionError(f"Connection closed with {remaining} bytes left to discard")
+        remaining -= count
+
+
+def recv_uint(sock, size):
+    """Receives a big-endian unsigned integer of `size` bytes."""
+    return int.from_bytes(recv_exactly(sock, size), 'big')
+
+
+def recv_u8(sock):
+    return recv_uint(sock, 1)
+
+
+def recv_u16(sock):
+    return recv_uint(sock, 2)
+
+
+def recv_u32(sock):
+    return recv_uint(sock, 4)
+
+
+def recv_u64(sock):
+    return recv_uint(sock, 8)
+
+
+def recv_field(sock, max_size):
+    """
+    Receives a u32 length-prefixed field, such as a filename or a wrapped key.
+    The length comes from the peer and recv_exactly() allocates that much up
+    front, so it is checked against `max_size` before anything is read.
+
+    Raises:
+        ConnectionError: If the peer announces more than `max_size` bytes. The rest
+                         of the message is not read, so the connection must be closed.
+    """
+    size = recv_u32(sock)
+    if size > max_size:
+        raise ConnectionError(f"Peer announced a {size}-byte field; the limit is {max_size} bytes")
+    return recv_exactly(sock, size)
+
+
+def send_buffers(sock, buffers):
+    """
+    Writes several buffers as one message with scatter-gather sendmsg(),
+    so small header fields and the payload leave in as few syscalls
+    (and TCP segments) as possible. Partial writes are resumed.
+
+    Args:
+        sock (socket.socket): The connected socket.
+        buffers (iterable): bytes-like objects to send, in order.
+    """
+    views = [memoryview(buffer).cast('B') for buffer in buffers if len(buffer)]
+    if not hasattr(sock, 'sendmsg'):
+        # Windows has no sendmsg(); a single joined write still avoids tiny segments.
+        sock.sendall(b''.join(views))
+        return
+
+    first = 0
+    while first < len(views):
+        sent = sock.sendmsg(views[first:first + MAX_IOVECS])
+        # Drop the buffers that went out completely and trim the partial one
+        while sent:
+            if sent >= len(views[first]):
+                sent -= len(views[first])
+                first += 1
+            else:
+                views[first] = views[first][sent:]
+                sent = 0
@@ -1,5 +1,5 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, simpledialog
 import threading
 import os
 import sys
@@ -67,7 +67,7 @@ class FileTransferGUI:
         self.client_download_dir_button.grid(row=0, column=1, **button_grid_options)
 
         # Row 1 (within button_frame, now effectively row 2 in root)
-        self.send_file_button = tk.Button(button_frame, text="3. Send File to Server",
+        self.send_file_button = tk.Button(button_frame, text="3. Send File(s) to Server",
                                           command=self.send_file_via_client,
                                           **button_style)
         self.send_file_button.grid(row=1, column=0, **button_grid_options)
@@ -78,10 +78,15 @@ class FileTransferGUI:
         self.clear_log_button.grid(row=1, column=1, **button_grid_options)
 
         # Row 2 (within button_frame, now effectively row 3 in root)
+        self.download_file_button = tk.Button(button_frame, text="4. Download File from Server",
+                                              command=self.download_file_via_client,
+                                              **button_style)
+        self.download_file_button.grid(row=2, column=0, **button_grid_options)
+
         self.save_log_button = tk.Button(button_frame, text="Save Log (to Logger Folder)",
                                          command=self.save_log_to_file,
                                          **button_style)
-        self.save_log_button.grid(row=2, column=0, columnspan=2, **button_grid_options)
+        self.save_log_button.grid(row=2, column=1, **button_grid_options)
 
         # --- Log Area ---
         self.logger = Logger(self.root)
@@ -93,11 +98,13 @@ class FileTransferGUI:
         self._auto_start_server()
 
     def _update_button_states(self):
-        """Updates the enabled/disabled state of buttons based on server_running flag."""
+        """Updates the enabled/disabled state of buttons based on whether the server keys exist."""
         if os.path.exists(server.PUBLIC_KEY_FILE):
             self.send_file_button.config(state=tk.NORMAL)
+            self.download_file_button.config(state=tk.NORMAL)
         else:
             self.send_file_button.config(state=tk.DISABLED)
+            self.download_file_button.config(state=tk.DISABLED)
 
         self.client_download_dir_button.config(state=tk.NORMAL)
         self.save_log_button.config(state=tk.NORMAL)
@@ -113,6 +120,7 @@ class FileTransferGUI:
             self.logger.append_log("[CRITICAL] 'crypto_utils.py' not found. Please ensure it's in the same directory.", "stderr")
             messagebox.showerror("Setup Error", "'crypto_utils.py' not found. Cannot proceed. Please place 'crypto_utils.py' in the same folder as this application.")
             self.send_file_button.config(state=tk.DISABLED)
+            self.download_file_button.config(state=tk.DISABLED)
             self.select_server_dir_button.config(state=tk.DISABLED)
             self.client_download_dir_button.config(state=tk.DISABLED)
             self.save_log_button.config(state=tk.DISABLED)
@@ -150,15 +158,13 @@ class FileTransferGUI:
     def set_client_download_directory(self):
         """
         Opens a dialog for the user to select a directory where the client
-        would save received files (if client had receiving functionality).
+        saves files downloaded from the server.
         """
         directory = filedialog.askdirectory(title="Choose a folder for Client to download files")
         if directory:
             self.client_download_directory = directory
             self.logger.append_log(f"Client download folder set to: {directory}", "info")
-            messagebox.showinfo("Client Download Folder",
-                                f"Client would download files to (if receiving): \n{directory}\n\n"
-                                "Note: The current client only SENDS files and does not have built-in receiving functionality.")
+            messagebox.showinfo("Client Download Folder", f"Client will download files to:\n{directory}")
         else:
             self.logger.append_log("Client download folder selection cancelled.", "warning")
 
@@ -171,7 +177,7 @@ class FileTransferGUI:
 
     def _check_server_status_after_start(self):
         """Checks server status after attempting to start it."""
-        if server.server_running:
+        if server.is_running():
             self.logger.append_log("Server started successfully and is listening for incoming files.", "success")
             self._update_button_states()
         else:
@@ -186,14 +192,19 @@ class FileTransferGUI:
             return
 
         self.logger.append_log("Opening file selection dialog...", "info")
-        filepath = filedialog.askopenfilename(
-            title="Select a file to send to the server",
+        filepaths = filedialog.askopenfilenames(
+            title="Select one or more files to send to the server",
             filetypes=[("All files", "*.*"), ("Text files", "*.txt"), ("PDF files", "*.pdf"), ("Image files", "*.png *.jpg *.jpeg *.gif")]
         )
-        if filepath:
+        if len(filepaths) == 1:
+            filepath = filepaths[0]
             self.logger.append_log(f"Preparing to send file: {os.path.basename(filepath)}...", "info")
             self.send_file_button.config(state=tk.DISABLED)
             threading.Thread(target=self._perform_send_file, args=(filepath,), daemon=True).start()
+        elif filepaths:
+            self.logger.append_log(f"Preparing to send {len(filepaths)} files (small files are packed together)...", "info")
+            self.send_file_button.config(state=tk.DISABLED)
+            threading.Thread(target=self._perform_send_files, args=(list(filepaths),), daemon=True).start()
         else:
             self.logger.append_log("File selection cancelled by user.", "warning")
 
@@ -211,15 +222,62 @@ class FileTransferGUI:
         finally:
             self.root.after(0, self._update_button_states)
 
+    def _perform_send_files(self, filepaths):
+        """Internal function to be run in a thread for sending several files at once."""
+        try:
+            client.send_files_packed(filepaths)
+            self.root.after(0, lambda: self.logger.append_log(f"Transfer of {len(filepaths)} files initiated. Check log for server's confirmation.", "success"))
+        except Exception as e:
+            self.root.after(0, lambda: self.logger.append_log(f"[!] Failed to send files: {e}", "stderr"))
+            self.root.after(0, lambda: messagebox.showerror("File Send Error", f"An error occurred while sending the files: {e}"))
+        finally:
+            self.root.after(0, self._update_button_states)
+
+    def download_file_via_client(self):
+        """Prompts user for a file name on the server and downloads it into the client download folder."""
+        if not os.path.exists(server.PUBLIC_KEY_FILE):
+            self.logger.append_log(f"[!] Cannot download file: '{server.PUBLIC_KEY_FILE}' is missing. Please start the server first.", "stderr")
+            messagebox.showerror("Error", "Server's public key is missing. Please start the server first to generate necessary encryption keys.")
+            return
+        if not self.client_download_directory:
+            self.logger.append_log("[!] Choose a client download folder first.", "warning")
+            messagebox.showwarning("Client Download Folder", "Please choose a client download folder first.")
+            return
+
+        filename = simpledialog.askstring("Download File", "Name of the file on the server:", parent=self.root)
+        if filename:
+            self.logger.append_log(f"Preparing to download file: {filename}...", "info")
+            self.download_file_button.config(state=tk.DISABLED)
+            threading.Thread(target=self._perform_download_file, args=(filename,), daemon=True).start()
+        else:
+            self.logger.append_log("File download cancelled by user.", "warning")
+
+    def _perform_download_file(self, filename):
+        """Internal function to be run in a thread for downloading a file."""
+        try:
+            client.download_file(filename, self.client_download_directory)
+        except Exception as e:
+            self.root.after(0, lambda: self.logger.append_log(f"[!] Failed to download file '{filename}': {e}", "stderr"))
+            self.root.after(0, lambda: messagebox.showerror("File Download Error", f"An error occurred while downloading the file: {e}"))
+        finally:
+            self.root.after(0, self._update_button_states)
+
     def _on_closing(self):
         """Handler for the window close event."""
-        if server.server_running:
+        client.close_connections()
+        if server.is_running():
             self.logger.append_log("Stopping server before exiting application...", "info")
             server.stop_server()
-            self.root.after(1000, self.root.destroy)
+            # Close the window as soon as the server has drained, without blocking the Tk loop meanwhile
+            threading.Thread(target=self._destroy_after_server_stops, daemon=True).start()
         else:
             self.root.destroy()
 
+    def _destroy_after_server_stops(self):
+        """Waits (in a thread) for the server thread to finish, then closes the window."""
+        self.server_thread.join()
+        self.root.after(0, self.root.destroy)
+
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,456 @@
+# loadgen.py
+#
+# Load generator for capacity testing. Starts `server.start_server` in a
+# separate process, drives it with N simulated clients and writes a
+# machine-readable JSON report (throughput, latency percentiles, errors,
+# server CPU/RSS over time) that can be compared across versions.
+#
+#   python loadgen.py --clients 8 --duration 30 --rate 200 --sizes lognormal:64K:1.0 --output report.json
+
+import argparse
+import datetime
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import psutil  # Optional: used for server CPU/RSS sampling when /proc is unavailable
+except ImportError:
+    psutil = None
+
+REPORT_VERSION = 1
+
+_SIZE_SUFFIXES = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(text):
+    """Parses a byte count such as '4096', '64K' or '10M'."""
+    text = text.strip().upper()
+    if text and text[-1] in _SIZE_SUFFIXES:
+        return int(float(text[:-1]) * _SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def parse_size_distribution(spec):
+    """
+    Builds a file-size sampler from a distribution spec:
+        fixed:SIZE               every file is SIZE bytes
+        uniform:MIN:MAX          uniformly distributed between MIN and MAX
+        lognormal:MEDIAN:SIGMA   log-normal around MEDIAN (heavy-tailed, like real uploads)
+        choice:S1,S2,...         picked uniformly from the listed sizes
+
+    Returns:
+        callable: A function taking a random.Random and returning a size in bytes.
+    """
+    kind, _, args = spec.partition(':')
+    params = args.split(':') if args else []
+    try:
+        if kind == 'fixed':
+            size = parse_size(params[0])
+            return lambda rng: size
+        if kind == 'uniform':
+            low, high = parse_size(params[0]), parse_size(params[1])
+            return lambda rng: rng.randint(low, high)
+        if kind == 'lognormal':
+            median, sigma = parse_size(params[0]), float(params[1])
+            return lambda rng: max(1, int(rng.lognormvariate(math.log(median), sigma)))
+        if kind == 'choice':
+            sizes = [parse_size(size) for size in params[0].split(',')]
+            return lambda rng: rng.choice(sizes)
+    except (IndexError, ValueError):
+        pass
+    raise argparse.ArgumentTypeError(f"Invalid size distribution: '{spec}'")
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def transport_overrides(args):
+    """
+    Maps the transport-tuning, storage and worker options to the config settings
+    they override, and raises the per-client connection limit to fit --clients.
+    """
+    overrides = {}
+    if args.chunk_size is not None:
+        overrides['CHUNK_SIZE'] = args.chunk_size
+    if args.adaptive is not None:
+        overrides['ADAPTIVE_CHUNKING'] = args.adaptive
+    if args.rcvbuf is not None:
+        overrides['SOCKET_RCVBUF'] = args.rcvbuf
+    if args.sndbuf is not None:
+        overrides['SOCKET_SNDBUF'] = args.sndbuf
+    if args.storage is not None:
+        overrides['STORAGE_MODE'] = args.storage
+    if args.workers is not None:
+        overrides['SERVER_WORKERS'] = args.workers
+    # Every simulated client connects from this machine with its own single-connection
+    # pool; with the default per-address limit, clients beyond it would just back off
+    from config import SERVER_MAX_CONNECTIONS_PER_CLIENT
+    overrides['SERVER_MAX_CONNECTIONS_PER_CLIENT'] = max(SERVER_MAX_CONNECTIONS_PER_CLIENT, args.clients)
+    return overrides
+
+
+def apply_config_overrides(overrides):
+    """Must run before client/server/framing are imported, since they import settings by name."""
+    import config
+    for name, value in overrides.items():
+        setattr(config, name, value)
+
+
+def run_server_process(port, save_directory, overrides):
+    """Process target: runs the real server on `port` with its logging silenced."""
+    apply_config_overrides(overrides)
+    import server
+    server.PORT = port
+    sys.stdout = open(os.devnull, 'w')
+    server.start_server(save_directory)
+
+
+def wait_for_port(host, port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+class ProcessSampler(threading.Thread):
+    """
+    Samples the CPU time and resident set size of a process and all of its
+    descendants (the worker processes of a multi-process server) at a fixed
+    interval. CPU time includes children that have exited and been reaped,
+    so replaced workers still count; RSS is summed over the live processes,
+    which counts shared pages more than once.
+    """
+
+    def __init__(self, pid, interval):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+        self._clock_ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+        self._process = psutil.Process(pid) if psutil else None
+
+    @staticmethod
+    def _read_stat(pid):
+        """Returns the fields of /proc/<pid>/stat after the parenthesised command name."""
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            return f.read().rsplit(')', 1)[1].split()
+
+    def _process_tree(self):
+        """Returns the sampled pid followed by the pids of its live descendants."""
+        children = {}
+        for entry in os.listdir('/proc'):
+            if entry.isdigit():
+                try:
+                    children.setdefault(int(self._read_stat(entry)[1]), []).append(int(entry))
+                except (OSError, IndexError, ValueError):
+                    continue  # Exited while we were looking
+        tree = [self.pid]
+        for pid in tree:
+            tree.extend(children.get(pid, []))
+        return tree
+
+    def _read_proc(self):
+        tree = self._process_tree()
+        # utime, stime, cutime, cstime (fields 14-17): the last two hold reaped children
+        fields = self._read_stat(self.pid)
+        cpu_ticks = sum(int(value) for value in fields[11:15])
+        rss = 0
+        for pid in tree:
+            try:
+                if pid != self.pid:
+                    cpu_ticks += sum(int(value) for value in self._read_stat(pid)[11:15])
+                with open(f'/proc/{pid}/status', 'r') as f:
+                    for line in f:
+                        if line.startswith('VmRSS:'):
+                            rss += int(line.split()[1]) * 1024
+            except OSError:
+                continue  # A worker that exited between listing and reading
+        return cpu_ticks / self._clock_ticks, rss, len(tree)
+
+    def _read_psutil(self):
+        processes = [self._process] + self._process.children(recursive=True)
+        cpu_seconds = 0.0
+        rss = 0
+        for process in processes:
+            try:
+                times = process.cpu_times()
+                cpu_seconds += (times.user + times.system
+                                + getattr(times, 'children_user', 0) + getattr(times, 'children_system', 0))
+                rss += process.memory_info().rss
+            except psutil.NoSuchProcess:
+                continue
+        return cpu_seconds, rss, len(processes)
+
+    def read(self):
+        """
+        Returns:
+            tuple[float, int, int]: Total CPU seconds (user + system), RSS in bytes and
+                                    the number of processes sampled, or (None, None, None)
+                                    if the process cannot be inspected.
+        """
+        try:
+            return self._read_proc()
+        except (OSError, IndexError, ValueError):
+            pass
+        if self._process is not None:
+            try:
+                return self._read_psutil()
+            except psutil.Error:
+                pass
+        return None, None, None
+
+    def run(self):
+        start = time.monotonic()
+        previous_cpu, previous_time = self.read()[0], start
+        while not self._stop_event.wait(self.interval):
+            now = time.monotonic()
+            cpu_seconds, rss, processes = self.read()
+            cpu_percent = None
+            if cpu_seconds is not None and previous_cpu is not None:
+                cpu_percent = 100.0 * (cpu_seconds - previous_cpu) / (now - previous_time)
+            self.samples.append({
+                "t": round(now - start, 3),
+                "cpu_seconds": cpu_seconds,
+                "cpu_percent": None if cpu_percent is None else round(cpu_percent, 1),
+                "rss_bytes": rss,
+                "processes": processes,
+            })
+            previous_cpu, previous_time = cpu_seconds, now
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class SimulatedClient(threading.Thread):
+    """
+    One simulated client with its own connection pool. With a rate it is
+    open-loop: uploads are scheduled by a Poisson process and latency is
+    measured from the scheduled time, so server stalls are not hidden by
+    clients that slow down with it. Without a rate it sends back-to-back.
+    """
+
+    def __init__(self, index, args, sample_size, payload, deadline, results, results_lock):
+        super().__init__(daemon=True)
+        self.index = index
+        self.args = args
+        self.sample_size = sample_size
+        self.payload = payload
+        self.deadline = deadline
+        self.results = results
+        self.results_lock = results_lock
+        self.rng = random.Random(args.seed + index)
+
+    def run(self):
+        import client
+        per_client_rate = self.args.rate / self.args.clients if self.args.rate else 0
+        transfer_client = client.FileTransferClient(host=self.args.host, port=self.args.port, max_pool_size=1)
+        next_arrival = time.monotonic()
+        sequence = 0
+        try:
+            while True:
+                if per_client_rate:
+                    next_arrival += self.rng.expovariate(per_client_rate)
+                    delay = next_arrival - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    start = next_arrival
+                else:
+                    start = time.monotonic()
+                if start >= self.deadline:
+                    break
+
+                size = self.sample_size(self.rng)
+                offset = self.rng.randrange(0, len(self.payload) - size + 1) if size < len(self.payload) else 0
+                data = self.payload[offset:offset + size]
+                filename = f"load_{self.index}_{sequence}.bin"
+                sequence += 1
+                error = None
+                try:
+                    transfer_client.send_data(filename, data)
+                except Exception as e:
+                    error = type(e).__name__
+                latency = time.monotonic() - start
+                with self.results_lock:
+                    self.results.append((latency, len(data), error))
+        finally:
+            transfer_client.close()
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True,
+                              text=True, timeout=5, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_load(args):
+    """Runs one load test and returns the report as a dict."""
+    save_directory = tempfile.mkdtemp(prefix='loadgen_')
+    overrides = transport_overrides(args)
+    apply_config_overrides(overrides)
+    # Not a daemon: a multi-process server starts worker processes of its own
+    server_process = multiprocessing.Process(target=run_server_process, args=(args.port, save_directory, overrides))
+    server_process.start()
+    try:
+        if not wait_for_port(args.host, args.port, args.startup_timeout):
+            raise RuntimeError(f"Server did not start listening on {args.host}:{args.port}")
+
+        sample_size = args.sizes
+        payload = os.urandom(max(args.payload_pool, 1))
+        results = []
+        results_lock = threading.Lock()
+        sampler = ProcessSampler(server_process.pid, args.sample_interval)
+        cpu_before = sampler.read()[0]
+        sampler.start()
+
+        started_at = datetime.datetime.now(datetime.timezone.utc)
+        start = time.monotonic()
+        deadline = start + args.duration
+        clients = [SimulatedClient(i, args, sample_size, payload, deadline, results, results_lock)
+                   for i in range(args.clients)]
+        for simulated_client in clients:
+            simulated_client.start()
+        for simulated_client in clients:
+            simulated_client.join()
+        elapsed = time.monotonic() - start
+
+        # Let the server finish writing the last uploads before the final sample
+        time.sleep(args.sample_interval)
+        sampler.stop()
+        cpu_after = sampler.read()[0]
+    finally:
+        server_process.terminate()
+        server_process.join(5)
+        shutil.rmtree(save_directory, ignore_errors=True)
+
+    latencies = sorted(latency for latency, _, error in results if error is None)
+    ok_bytes = sum(size for _, size, error in results if error is None)
+    error_types = {}
+    for _, _, error in results:
+        if error is not None:
+            error_types[error] = error_types.get(error, 0) + 1
+    server_cpu = None if cpu_before is None or cpu_after is None else cpu_after - cpu_before
+    rss_values = [sample["rss_bytes"] for sample in sampler.samples if sample["rss_bytes"] is not None]
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        "report_version": REPORT_VERSION,
+        "revision": _git_revision(),
+        "started_at": started_at.isoformat(),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "config": {
+            "clients": args.clients,
+            "server_max_connections_per_client": overrides['SERVER_MAX_CONNECTIONS_PER_CLIENT'],
+            "duration_s": args.duration,
+            "rate_per_s": args.rate,
+            "sizes": args.sizes_spec,
+            "seed": args.seed,
+            "transport": overrides,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "uploads": {"ok": len(latencies), "errors": len(results) - len(latencies), "error_types": error_types},
+        "throughput": {
+            "uploads_per_s": round(len(latencies) / elapsed, 3),
+            "bytes_per_s": round(ok_bytes / elapsed, 1),
+        },
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 0.50)),
+            "p95": ms(percentile(latencies, 0.95)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "max": ms(latencies[-1] if latencies else None),
+            "mean": ms(sum(latencies) / len(latencies) if latencies else None),
+        },
+        "server": {
+            "cpu_seconds": None if server_cpu is None else round(server_cpu, 3),
+            "cpu_seconds_per_gb": None if server_cpu is None or not ok_bytes else round(server_cpu / (ok_bytes / 1e9), 3),
+            "peak_rss_bytes": max(rss_values) if rss_values else None,
+            "samples": sampler.samples,
+        },
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Load-test the secure file transfer server.")
+    parser.add_argument('--clients', type=int, default=4, help="Number of simulated clients (threads)")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds to generate load")
+    parser.add_argument('--rate', type=float, default=0,
+                        help="Total uploads per second across all clients (Poisson arrivals); 0 = as fast as possible")
+    parser.add_argument('--sizes', dest='sizes_spec', default='fixed:64K',
+                        help="File-size distribution: fixed:SIZE, uniform:MIN:MAX, lognormal:MEDIAN:SIGMA or choice:S1,S2,...")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9998, help="Port for the locally started server")
+    parser.add_argument('--sample-interval', type=float, default=0.5, help="Seconds between server CPU/RSS samples")
+    parser.add_argument('--payload-pool', type=parse_size, default=parse_size('16M'),
+                        help="Size of the random buffer uploads are sliced from")
+    parser.add_argument('--seed', type=int, default=1)
+    transport = parser.add_argument_group("transport tuning (defaults come from config.py)")
+    transport.add_argument('--chunk-size', type=parse_size, help="Fixed recv size (CHUNK_SIZE)")
+    transport.add_argument('--adaptive', dest='adaptive', action='store_true', default=None,
+                           help="Enable adaptive chunk sizing")
+    transport.add_argument('--fixed', dest='adaptive', action='store_false', help="Disable adaptive chunk sizing")
+    transport.add_argument('--rcvbuf', type=parse_size, help="SO_RCVBUF (0 = OS default)")
+    transport.add_argument('--sndbuf', type=parse_size, help="SO_SNDBUF (0 = OS default)")
+    parser.add_argument('--workers', type=int, help="Server processes (SERVER_WORKERS; default from config.py)")
+    parser.add_argument('--storage', choices=('plaintext', 'encrypted'),
+                        help="Server storage mode (STORAGE_MODE; default from config.py)")
+    parser.add_argument('--startup-timeout', type=float, default=15)
+    parser.add_argument('--output', help="Write the JSON report to this file instead of stdout")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        args.sizes = parse_size_distribution(args.sizes_spec)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    # The client logs every transfer; keep the console for the summary
+    real_stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        report = run_load(args)
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+        latency = report["latency_ms"]
+        print(f"[+] {report['uploads']['ok']} uploads ({report['uploads']['errors']} errors), "
+              f"{report['throughput']['uploads_per_s']} uploads/s, "
+              f"p50/p95/p99 {latency['p50']}/{latency['p95']}/{latency['p99']} ms. Report: {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,92 @@
 # server.py
 
+import hashlib
+import multiprocessing
+import multiprocessing.connection
 import socket
 import os
-import threading # Import threading for the server_running flag
+import selectors
+import signal
+import tempfile
+import threading
+import time
 
+import config
+import server_worker
+
+from admission import AdmissionController
+from storage import EncryptedStore, load_storage_key
 from crypto_utils import (
     generate_rsa_keys,
-    rsa_decrypt,
-    decrypt_file
+    get_cipher_suite,
+    negotiate_cipher_suite,
+    preferred_cipher_suites,
+    rsa_decrypt
+)
+from framing import (
+    DIGEST_SIZE,
+    AdaptiveChunker,
+    HELLO_BUSY,
+    HELLO_NO_SUITE,
+    HELLO_OK,
+    MSG_ACK,
+    MSG_CLOSE,
+    MSG_DOWNLOAD,
+    MSG_FILE,
+    MSG_PACK,
+    MSG_PING,
+    MSG_PONG,
+    MSG_STAT,
+    STATUS_CHANGED,
+    STATUS_ERROR,
+    STATUS_NOT_FOUND,
+    STATUS_OK,
+    discard_exactly,
+    parse_pack,
+    recv_exactly,
+    recv_field,
+    recv_u8,
+    recv_u32,
+    recv_u64,
+    send_buffers,
+    set_nodelay,
+    tune_socket,
+    u8,
+    u16,
+    u32,
+    u64
+)
+from config import (
+    ADAPTIVE_CHUNKING,
+    ADMISSION_DEFER_TIMEOUT,
+    CHUNK_SIZE,
+    DOWNLOAD_CHUNK_SIZE,
+    SERVER_BUSY_RETRY_AFTER,
+    SERVER_DRAIN_TIMEOUT,
+    SERVER_IDLE_TIMEOUT,
+    SERVER_MAX_CONNECTIONS_PER_CLIENT,
+    SERVER_MAX_KEY_BYTES,
+    SERVER_MAX_NAME_BYTES,
+    SERVER_MAX_PACK_BYTES,
+    SERVER_MEMORY_BUDGET,
+    SERVER_SPILL_TO_DISK,
+    SERVER_WORKER_START_TIMEOUT,
+    SERVER_WORKERS,
+    STORAGE_MODE
 )
 
 HOST = '0.0.0.0'
 PORT = 9999
-BUFFER_SIZE = 4096
 
 # RSA Key file paths
 PRIVATE_KEY_FILE = 'server_private.pem'
 PUBLIC_KEY_FILE = 'server_public.pem'
 
-# Global flag to control server execution
-server_running = False
+_stop_signal = None # StopSignal of the running server; None while it is not running
+_state_lock = threading.Lock() # Guards starting and stopping
 server_socket_instance = None # To hold the socket object for closing
+admission_controller = None # Memory budget and per-client limits, created by start_server
+encrypted_store = None # EncryptedStore of the save directory when STORAGE_MODE is 'encrypted'
 
 # Generate RSA keys if not present
 if not os.path.exists(PRIVATE_KEY_FILE) or not os.path.exists(PUBLIC_KEY_FILE):
@@ -33,83 +99,535 @@ else:
     with open(PRIVATE_KEY_FILE, 'rb') as f:
         private_key = f.read()
 
-def start_server(save_directory=None):
+class StopSignal:
     """
-    Starts the server to listen for incoming file transfers.
-    It generates RSA keys if they don't exist, receives an encrypted AES key,
-    decrypts it, receives the encrypted file, decrypts it, and saves it.
+    A stop request that select() can wait on. set() writes a byte to a
+    socketpair, so the accept loop and connections waiting for their next
+    message wake at once instead of polling a flag. The byte is never read:
+    the signal stays readable, and every waiter sees it.
 
-    Args:
-        save_directory (str, optional): The directory where received files will be saved.
-                                        If None, files will be saved in a 'received_files'
-                                        subdirectory in the current working directory.
+    set() is a single non-blocking send, safe to call from another thread
+    or from a signal handler.
     """
-    global server_running, server_socket_instance, private_key
-    if server_running:
-        print("[!] Server is already running.")
-        return
 
-    server_running = True
-    print(f"[+] Starting server on {HOST}:{PORT}...")
+    def __init__(self):
+        self._reader, self._writer = socket.socketpair()
+        self._reader.setblocking(False)
+        self._writer.setblocking(False)
+        self._set = False
+
+    def set(self):
+        self._set = True
+        try:
+            self._writer.send(b'\0')
+        except OSError:
+            pass  # Already signalled (buffer full) or closed after the server stopped
+
+    def is_set(self):
+        return self._set
+
+    def fileno(self):
+        return self._reader.fileno()
+
+    def close(self):
+        self._reader.close()
+        self._writer.close()
+
+
+def _resolve_save_directory(save_directory):
+    """Determines (and creates) the directory where received files will be saved."""
+    directory = save_directory or "received_files"
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _safe_filename(filename):
+    """Strips any directory parts from a client-supplied name so files can only land in the save directory."""
+    base_name = os.path.basename(filename.replace('\\', '/'))
+    if base_name in ('', '.', '..'):
+        raise ValueError(f"Invalid filename: {filename!r}")
+    return base_name
+
+
+def _resolve_save_path(save_directory, original_filename):
+    """Determines the full path where a received file will be saved."""
+    return os.path.join(_resolve_save_directory(save_directory), _safe_filename(original_filename))
+
+
+def _read_hello(conn):
+    """Reads the client's advertised cipher suites (count, then length-prefixed names)."""
+    offered_count = recv_u8(conn)
+    offered_suites = []
+    for _ in range(offered_count):
+        name_length = recv_u8(conn)
+        offered_suites.append(recv_exactly(conn, name_length).decode('ascii'))
+    return offered_suites
 
+
+def _negotiate_suite(conn, offered_suites):
+    """
+    Cipher-suite negotiation: we answer the client's hello with HELLO_OK and
+    our pick, or HELLO_NO_SUITE if there is no common suite.
+
+    Returns:
+        ICipherSuite: The agreed suite, or None if negotiation failed.
+    """
     try:
-        server_socket_instance = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server_socket_instance.settimeout(1) # Set a timeout to allow checking the flag
-        server_socket_instance.bind((HOST, PORT))
-        server_socket_instance.listen(1) # Listen for one connection at a time
-        print(f"[+] Server listening on {HOST}:{PORT}...")
+        suite = get_cipher_suite(negotiate_cipher_suite(offered_suites))
+    except ValueError as e:
+        send_buffers(conn, [u8(HELLO_NO_SUITE)])
+        print(f"[!] {e}")
+        return None
+    send_buffers(conn, [u8(HELLO_OK), u8(len(suite.name)), suite.name.encode('ascii')])
+    print(f"[+] Negotiated cipher suite: {suite.name}")
+    return suite
+
+
+class TransferRejected(Exception):
+    """
+    An upload was read completely but could not be saved. The client gets a
+    nack for it and the connection stays usable for further messages.
+    """
+
+
+def _send_ack(conn, sequence, status, digest=None, reason=''):
+    """Answers one upload with MSG_ACK: sequence, status, ciphertext digest and reason."""
+    reason_bytes = reason.encode('utf-8')[:1024]
+    send_buffers(conn, [
+        u8(MSG_ACK), u32(sequence), u8(status),
+        digest or bytes(DIGEST_SIZE),
+        u16(len(reason_bytes)), reason_bytes,
+    ])
+
 
-        while server_running:
+def _write_file_atomically(save_path, data):
+    """
+    Writes `data` to a temporary file next to `save_path` and moves it into
+    place, so a concurrent download never reads a half-written file.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(save_path) or '.', suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, save_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def _receive_file_streaming(conn, decryptor, file_size, save_path, chunker):
+    """
+    Receives and decrypts file data chunk by chunk into a temporary file next
+    to `save_path`, so memory use stays at one chunk whatever the file size.
+    The temporary file replaces `save_path` only once decryption succeeded.
+
+    Returns:
+        bytes: The SHA-256 digest of the received ciphertext.
+    """
+    digest = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(save_path) or '.', suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            remaining = file_size
+            while remaining:
+                chunk_size = chunker.size if chunker is not None else CHUNK_SIZE
+                chunk = recv_exactly(conn, min(remaining, chunk_size), CHUNK_SIZE, chunker)
+                digest.update(chunk)
+                f.write(decryptor.update(chunk))
+                remaining -= len(chunk)
             try:
-                conn, addr = server_socket_instance.accept()
-                with conn:
-                    print(f"[+] Connected by {addr}")
-
-                    # New Step: Receive filename length (4 bytes) and the actual filename
-                    filename_length = int.from_bytes(conn.recv(4), 'big')
-                    original_filename = conn.recv(filename_length).decode('utf-8')
-                    print(f"[+] Receiving file: '{original_filename}'")
-
-                    # Determine the full path where the file will be saved
-                    if save_directory:
-                        os.makedirs(save_directory, exist_ok=True)
-                        save_path = os.path.join(save_directory, original_filename)
+                f.write(decryptor.finalize())
+            except ValueError as e:
+                # All data was read, so the connection is still in sync
+                raise TransferRejected(f"Could not decrypt '{os.path.basename(save_path)}': {e}") from e
+        os.replace(temp_path, save_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return digest.digest()
+
+
+def _receive_file(conn, suite, save_directory, chunker):
+    """
+    Receives one MSG_FILE message body, decrypts the file and saves it.
+    The file data is read in CHUNK_SIZE pieces, or sized by `chunker` if given.
+
+    Files are buffered in memory only within the admission controller's memory
+    budget. If the budget stays full for ADMISSION_DEFER_TIMEOUT seconds (or the
+    file could never fit), the file is streamed through a temporary file instead.
+
+    Returns:
+        bytes: The SHA-256 digest of the received ciphertext.
+
+    Raises:
+        TransferRejected: If the file was read but cannot be saved.
+    """
+    # Receive filename length (4 bytes) and the actual filename. Lengths are capped
+    # before reading: the buffer is allocated outside the memory budget.
+    raw_filename = recv_field(conn, SERVER_MAX_NAME_BYTES)
+
+    # Step 1: Receive encrypted file key size (4 bytes) and data
+    encrypted_file_key = bytes(recv_field(conn, SERVER_MAX_KEY_BYTES))
+
+    # Step 2: Receive encrypted file size (8 bytes). The size is client-supplied,
+    # so nothing is allocated for it until the memory budget allows.
+    file_size = recv_u64(conn)
+
+    # Step 3: Check the name and decrypt the file key using the server's private RSA key.
+    # A rejected file's data is still read, to keep the connection in sync.
+    try:
+        original_filename = raw_filename.decode('utf-8')
+        save_path = _resolve_save_path(save_directory, original_filename)
+        file_key = rsa_decrypt(encrypted_file_key, private_key)
+    except ValueError as e:
+        discard_exactly(conn, file_size)
+        raise TransferRejected(f"Invalid upload header: {e}") from e
+    print(f"[+] Receiving file: '{original_filename}'")
+    print("[+] File key received and decrypted.")
+
+    if encrypted_store is not None:
+        # Store-encrypted mode: keep the ciphertext as received, decrypt on first read
+        digest = encrypted_store.store_stream(conn, os.path.basename(save_path), suite.name, file_key, file_size, chunker)
+        print(f"[+] Encrypted file stored as '{os.path.basename(save_path)}' ({file_size} bytes)")
+        return digest
+
+    # Buffering in memory holds both the ciphertext and the decrypted copy
+    reservation = 2 * file_size
+    defer_timeout = ADMISSION_DEFER_TIMEOUT if SERVER_SPILL_TO_DISK else None
+    if not admission_controller.reserve_memory(reservation, defer_timeout):
+        if not SERVER_SPILL_TO_DISK:
+            discard_exactly(conn, file_size)
+            raise TransferRejected(f"File of {file_size} bytes exceeds the server memory budget")
+        print(f"[*] No memory budget for '{original_filename}' ({file_size} bytes); streaming it through a temporary file.")
+        digest = _receive_file_streaming(conn, suite.decryptor(file_key), file_size, save_path, chunker)
+        print(f"[+] File decrypted and saved as '{save_path}'")
+        return digest
+
+    try:
+        received_data = recv_exactly(conn, file_size, CHUNK_SIZE, chunker)
+        print(f"[+] Encrypted file received: {len(received_data)} bytes")
+        digest = hashlib.sha256(received_data).digest()
+
+        # Step 4: Decrypt the received file data with the negotiated suite
+        try:
+            decrypted_file_data = suite.decrypt(received_data, file_key)
+            _write_file_atomically(save_path, decrypted_file_data)
+        except (ValueError, OSError) as e:
+            raise TransferRejected(f"Could not decrypt or save '{original_filename}': {e}") from e
+    finally:
+        admission_controller.release_memory(reservation)
+    print(f"[+] File decrypted and saved as '{save_path}'")
+    return digest
+
+
+def _receive_pack(conn, suite, save_directory, chunker):
+    """
+    Receives one MSG_PACK message: a container of small files encrypted as a
+    whole under a single key. The container is decrypted in memory (it is
+    bounded by SERVER_MAX_PACK_BYTES and the memory budget) and its files are
+    written out together.
+
+    Returns:
+        bytes: The SHA-256 digest of the received ciphertext.
+
+    Raises:
+        TransferRejected: If the container was read but its files cannot be saved.
+    """
+    encrypted_pack_key = bytes(recv_field(conn, SERVER_MAX_KEY_BYTES))
+    pack_size = recv_u64(conn)
+
+    try:
+        pack_key = rsa_decrypt(encrypted_pack_key, private_key)
+    except ValueError as e:
+        discard_exactly(conn, pack_size)
+        raise TransferRejected(f"Invalid upload header: {e}") from e
+    if pack_size > SERVER_MAX_PACK_BYTES:
+        discard_exactly(conn, pack_size)
+        raise TransferRejected(f"Packed container of {pack_size} bytes exceeds the {SERVER_MAX_PACK_BYTES}-byte limit")
+    # Holds both the ciphertext and the decrypted container
+    reservation = 2 * pack_size
+    if not admission_controller.reserve_memory(reservation):
+        discard_exactly(conn, pack_size)
+        raise TransferRejected(f"Packed container of {pack_size} bytes exceeds the server memory budget")
+
+    try:
+        encrypted_pack = recv_exactly(conn, pack_size, CHUNK_SIZE, chunker)
+        digest = hashlib.sha256(encrypted_pack).digest()
+        try:
+            entries = parse_pack(suite.decrypt(encrypted_pack, pack_key))
+            del encrypted_pack
+
+            directory = _resolve_save_directory(save_directory)
+            # Check every name first, so a rejected container writes none of its files
+            targets = [(os.path.join(directory, _safe_filename(filename)), file_data) for filename, file_data in entries]
+            for path, file_data in targets:
+                _write_file_atomically(path, file_data)
+                if encrypted_store is not None:
+                    # Packed files are saved as plaintext; an older stored copy must not shadow them
+                    encrypted_store.discard(os.path.basename(path))
+        except (ValueError, OSError) as e:
+            raise TransferRejected(f"Could not unpack container: {e}") from e
+    finally:
+        admission_controller.release_memory(reservation)
+    print(f"[+] Unpacked {len(entries)} files from a {pack_size}-byte container into '{directory}'")
+    return digest
+
+
+def _file_version(stat_result):
+    """
+    Identifies one version of a saved file. Uploads replace files with
+    os.replace(), so a new upload has a new inode and modification time
+    even when its size is unchanged.
+    """
+    identity = f"{stat_result.st_ino}:{stat_result.st_mtime_ns}".encode('ascii')
+    return int.from_bytes(hashlib.sha256(identity).digest()[:8], 'big')
+
+
+def _open_saved_file(save_directory, filename):
+    """
+    Opens a file from the save directory for reading; only plain names are accepted.
+    Files kept in store-encrypted mode are decrypted on their first access.
+
+    Returns:
+        tuple[file, int]: The open file and its version (see _file_version).
+    """
+    name = _safe_filename(filename)
+    if encrypted_store is not None and name in encrypted_store:
+        return encrypted_store.open_versioned(name)
+    f = open(os.path.join(_resolve_save_directory(save_directory), name), 'rb')
+    return f, _file_version(os.fstat(f.fileno()))
+
+
+def _stat_saved_file(save_directory, filename):
+    """
+    Returns the size and version of a file from the save directory. Stored
+    files of AEAD suites are answered from their index record; only padded
+    ones are decrypted (as a download would) to learn their size.
+    """
+    name = _safe_filename(filename)
+    if encrypted_store is not None and name in encrypted_store:
+        known = encrypted_store.stat(name)
+        if known is not None:
+            return known
+    f, version = _open_saved_file(save_directory, name)
+    with f:
+        return os.fstat(f.fileno()).st_size, version
+
+
+def _handle_stat(conn, save_directory):
+    """Answers MSG_STAT: status (1 byte) + file size (8 bytes) + version (8 bytes)."""
+    filename = recv_field(conn, SERVER_MAX_NAME_BYTES).decode('utf-8')
+    try:
+        size, version = _stat_saved_file(save_directory, filename)
+    except (OSError, ValueError) as e:
+        status = STATUS_NOT_FOUND if isinstance(e, FileNotFoundError) else STATUS_ERROR
+        send_buffers(conn, [u8(status), u64(0), u64(0)])
+        return
+    send_buffers(conn, [u8(STATUS_OK), u64(size), u64(version)])
+
+
+def _send_range(conn, suite, save_directory):
+    """
+    Answers MSG_DOWNLOAD (filename, offset, length, expected version,
+    RSA-wrapped session key): status (1 byte), total file size (8 bytes),
+    served length (8 bytes) and current version (8 bytes), then the range as
+    encrypted chunks of DOWNLOAD_CHUNK_SIZE plaintext bytes, each framed as
+    length (4 bytes) + data. Every chunk is encrypted on its own and starts
+    with its file offset (8 bytes), so the client can decrypt and place chunks
+    independently and detect reordered or replayed ones. If the file is no
+    longer the version the client expects, the status is STATUS_CHANGED and
+    no data follows, so ranges of two versions never end up in one download.
+    """
+    filename = recv_field(conn, SERVER_MAX_NAME_BYTES).decode('utf-8')
+    offset = recv_u64(conn)
+    length = recv_u64(conn)
+    expected_version = recv_u64(conn)
+    session_key = rsa_decrypt(bytes(recv_field(conn, SERVER_MAX_KEY_BYTES)), private_key)
+
+    try:
+        f, version = _open_saved_file(save_directory, filename)
+    except (OSError, ValueError) as e:
+        status = STATUS_NOT_FOUND if isinstance(e, FileNotFoundError) else STATUS_ERROR
+        send_buffers(conn, [u8(status), u64(0), u64(0), u64(0)])
+        print(f"[!] Download of '{filename}' refused: {e}")
+        return
+
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if version != expected_version:
+            send_buffers(conn, [u8(STATUS_CHANGED), u64(size), u64(0), u64(version)])
+            print(f"[!] Download of '{filename}' refused: the file was replaced since the client's stat.")
+            return
+        offset = min(offset, size)
+        length = min(length, size - offset)
+        send_buffers(conn, [u8(STATUS_OK), u64(size), u64(length), u64(version)])
+
+        f.seek(offset)
+        buffer = bytearray(DOWNLOAD_CHUNK_SIZE)
+        view = memoryview(buffer)
+        position = offset
+        remaining = length
+        while remaining:
+            count = f.readinto(view[:min(remaining, DOWNLOAD_CHUNK_SIZE)])
+            if not count:
+                raise ValueError(f"'{filename}' shrank while being downloaded")
+            encrypted_chunk = suite.encrypt(u64(position) + view[:count], session_key)
+            send_buffers(conn, [u32(len(encrypted_chunk)), encrypted_chunk])
+            position += count
+            remaining -= count
+    print(f"[+] Sent bytes {offset}-{offset + length} of '{filename}' ({size} bytes)")
+
+
+def _wait_for_message(conn, selector, stop_signal):
+    """
+    Waits for the next message on a keep-alive connection. `selector` has
+    `conn` and `stop_signal` registered for reading; unlike select.select(),
+    it also works for descriptors above FD_SETSIZE (1024), which a server
+    with many open connections hands out.
+
+    Returns:
+        int: The message type, or None on EOF, idle timeout or server stop.
+    """
+    events = selector.select(SERVER_IDLE_TIMEOUT)
+    if stop_signal.is_set():
+        return None
+    if not events:
+        print("[*] Closing idle connection.")
+        return None
+    message_type = conn.recv(1)
+    return message_type[0] if message_type else None
+
+
+def _handle_connection(conn, addr, save_directory, stop_signal):
+    """
+    Serves one client connection in its own thread: negotiates the cipher
+    suite once, then handles messages until the client closes the connection,
+    it stays idle for SERVER_IDLE_TIMEOUT seconds, or `stop_signal` is set.
+    A message in progress when the server stops is finished first.
+    """
+    chunker = None
+    selector = None
+    client_id = addr[0]
+    admitted = admission_controller.admit_connection(client_id)
+    with conn:
+        try:
+            # Inactivity limit while in the middle of a message
+            conn.settimeout(SERVER_IDLE_TIMEOUT)
+            set_nodelay(conn)
+            print(f"[+] Connected by {addr}")
+
+            # Read the hello even when rejecting: closing with unread data
+            # would reset the connection before the client sees our answer.
+            offered_suites = _read_hello(conn)
+            if not admitted:
+                print(f"[!] {client_id} has too many connections; answering busy.")
+                send_buffers(conn, [u8(HELLO_BUSY), u32(int(SERVER_BUSY_RETRY_AFTER * 1000))])
+                return
+            suite = _negotiate_suite(conn, offered_suites)
+            if suite is None:
+                return
+            # Read sizes adapt per connection, since each client has its own link
+            chunker = AdaptiveChunker() if ADAPTIVE_CHUNKING else None
+            selector = selectors.DefaultSelector()
+            selector.register(conn, selectors.EVENT_READ)
+            selector.register(stop_signal, selectors.EVENT_READ)
+
+            while True:
+                message_type = _wait_for_message(conn, selector, stop_signal)
+                if message_type is None or message_type == MSG_CLOSE:
+                    break
+                if message_type == MSG_PING:
+                    send_buffers(conn, [u8(MSG_PONG)])
+                elif message_type in (MSG_FILE, MSG_PACK):
+                    # Uploads are acknowledged in order; the client matches acks by sequence number
+                    sequence = recv_u32(conn)
+                    receive = _receive_file if message_type == MSG_FILE else _receive_pack
+                    try:
+                        digest = receive(conn, suite, save_directory, chunker)
+                    except TransferRejected as e:
+                        print(f"[!] Upload {sequence} from {addr} rejected: {e}")
+                        _send_ack(conn, sequence, STATUS_ERROR, reason=str(e))
                     else:
-                        default_save_dir = "received_files"
-                        os.makedirs(default_save_dir, exist_ok=True)
-                        save_path = os.path.join(default_save_dir, original_filename)
-
-                    # Step 1: Receive encrypted AES key size (4 bytes) and data
-                    encrypted_key_size = int.from_bytes(conn.recv(4), 'big')
-                    encrypted_aes_key = conn.recv(encrypted_key_size)
-
-                    # Step 2: Decrypt AES key using the server's private RSA key
-                    aes_key = rsa_decrypt(encrypted_aes_key, private_key)
-                    print("[+] AES key received and decrypted.")
-
-                    # Step 3: Receive encrypted file size (8 bytes) and the file data
-                    file_size = int.from_bytes(conn.recv(8), 'big')
-                    received_data = b''
-                    while len(received_data) < file_size:
-                        chunk = conn.recv(min(BUFFER_SIZE, file_size - len(received_data)))
-                        if not chunk:
-                            break
-                        received_data += chunk
-                    print(f"[+] Encrypted file received: {len(received_data)} bytes")
-
-                    # Step 4: Decrypt the received file data using the decrypted AES key
-                    decrypted_file_data = decrypt_file(received_data, aes_key)
-                    with open(save_path, 'wb') as f:
-                        f.write(decrypted_file_data)
-                    print(f"[+] File decrypted and saved as '{save_path}'")
-
-            except socket.timeout:
-                # Timeout occurred, check server_running flag and continue loop
-                pass
-            except Exception as e:
-                print(f"[!] Error during file transfer: {e}")
-                if server_running: # Only print if server is still supposed to be running
-                    print("[!] Server encountered an error, but will continue listening.")
+                        _send_ack(conn, sequence, STATUS_OK, digest)
+                elif message_type == MSG_STAT:
+                    _handle_stat(conn, save_directory)
+                elif message_type == MSG_DOWNLOAD:
+                    _send_range(conn, suite, save_directory)
+                else:
+                    print(f"[!] Unknown message type {message_type} from {addr}, closing connection.")
+                    break
+        except Exception as e:
+            print(f"[!] Error during file transfer with {addr}: {e}")
+        finally:
+            if selector is not None:
+                selector.close()
+            if admitted:
+                admission_controller.release_connection(client_id)
+        if chunker is not None and chunker.total_calls:
+            print(f"[+] Connection from {addr} closed ({chunker.describe()}).")
+        else:
+            print(f"[+] Connection from {addr} closed.")
+
+
+def _init_server_state(save_directory, memory_budget):
+    """Creates the admission controller and, in store-encrypted mode, the encrypted store."""
+    global admission_controller, encrypted_store
+    admission_controller = AdmissionController(memory_budget, SERVER_MAX_CONNECTIONS_PER_CLIENT)
+    encrypted_store = None
+    if STORAGE_MODE == 'encrypted':
+        encrypted_store = EncryptedStore(_resolve_save_directory(save_directory), load_storage_key())
+        print(f"[+] Store-encrypted mode: uploads are kept encrypted in '{encrypted_store.directory}'.")
+
+
+def _serve(save_directory, stop_signal, reuse_port=False, on_listening=None):
+    """
+    Listens on HOST:PORT and serves every client connection in its own
+    thread until `stop_signal` is set, then drains the open connections.
+    The accept loop sleeps in select() on the listening socket and the stop
+    signal, so an idle server uses no CPU and stops without delay.
+
+    Args:
+        save_directory (str): Where received files are saved.
+        stop_signal (StopSignal): Stops the server when set.
+        reuse_port (bool): Bind with SO_REUSEPORT, so several worker processes share the port.
+        on_listening (callable, optional): Called once the socket is listening.
+    """
+    global server_socket_instance
+    connections = {}  # Handler thread -> its connection, for cutting off transfers that outlast the drain
+    try:
+        with selectors.DefaultSelector() as selector:
+            server_socket_instance = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            if reuse_port:
+                # Every worker binds the same port; the kernel spreads new connections across them
+                server_socket_instance.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            server_socket_instance.setblocking(False)
+            tune_socket(server_socket_instance) # Accepted connections inherit the buffer sizes
+            server_socket_instance.bind((HOST, PORT))
+            server_socket_instance.listen(socket.SOMAXCONN)
+            selector.register(server_socket_instance, selectors.EVENT_READ)
+            selector.register(stop_signal, selectors.EVENT_READ)
+            print(f"[+] Server listening on {HOST}:{PORT}...")
+            if on_listening is not None:
+                on_listening()
+
+            while not stop_signal.is_set():
+                for key, _ in selector.select():
+                    if key.fileobj is not server_socket_instance:
+                        continue
+                    try:
+                        conn, addr = server_socket_instance.accept()
+                    except BlockingIOError:
+                        continue  # Taken by another worker sharing the port
+                    except OSError as e:
+                        print(f"[!] Error accepting connection: {e}")
+                        print("[!] Server encountered an error, but will continue listening.")
+                        continue
+                    conn.setblocking(True)
+                    handler = threading.Thread(target=_handle_connection,
+                                               args=(conn, addr, save_directory, stop_signal), daemon=True)
+                    connections = {thread: sock for thread, sock in connections.items() if thread.is_alive()}
+                    connections[handler] = conn
+                    handler.start()
         print("[+] Server stopped listening.")
     except Exception as e:
         print(f"[!] Server startup error: {e}")
@@ -117,18 +635,227 @@ def start_server(save_directory=None):
         if server_socket_instance:
             server_socket_instance.close()
             print("[+] Server socket closed.")
-        server_running = False # Ensure flag is reset
+    _drain_connections(connections)
+
+
+def _drain_connections(connections):
+    """
+    Waits up to SERVER_DRAIN_TIMEOUT seconds for connection threads to finish
+    the transfers they are in (idle connections close as soon as the stop
+    signal is set), then shuts down the connections still open.
+
+    Args:
+        connections (dict): Handler thread -> its connection.
+    """
+    deadline = time.monotonic() + SERVER_DRAIN_TIMEOUT
+    for handler in connections:
+        handler.join(max(0, deadline - time.monotonic()))
+    unfinished = [(handler, conn) for handler, conn in connections.items() if handler.is_alive()]
+    if not unfinished:
+        return
+    print(f"[!] Closing {len(unfinished)} connection(s) still transferring after {SERVER_DRAIN_TIMEOUT} s.")
+    for _, conn in unfinished:
+        try:
+            conn.shutdown(socket.SHUT_RDWR)  # Wakes the handler's blocked recv/send
+        except OSError:
+            pass  # Closed by its handler in the meantime
+    for handler, _ in unfinished:
+        handler.join(1)
+
+
+def _forward_worker_output(readers, timeout, wake=()):
+    """
+    Prints the log lines worker processes send over their pipes. A pipe at
+    EOF belongs to a worker that exited and is dropped from `readers`.
+
+    Args:
+        readers (dict): Pipe connection -> worker index.
+        timeout (float): Seconds to wait for output; None waits until something is ready.
+        wake (iterable): More waitable objects (the stop signal, process
+                         sentinels) that end the wait when ready.
+
+    Returns:
+        list[int]: Workers that reported they are listening.
+    """
+    listening = []
+    for ready in multiprocessing.connection.wait(list(readers) + list(wake), timeout):
+        if ready not in readers:
+            continue
+        try:
+            event = ready.recv()
+        except EOFError:
+            readers.pop(ready)
+            ready.close()
+            continue
+        if event[0] == 'log':
+            print(event[1])
+        else:
+            listening.append(readers[ready])
+    return listening
+
+
+def _supervise_workers(save_directory, workers, stop_signal):
+    """
+    Runs the server as `workers` processes that each bind HOST:PORT with
+    SO_REUSEPORT, so decryption and RSA unwraps run in parallel instead of
+    contending for one interpreter lock. Workers share this process's key
+    material and configuration, split the memory budget evenly and send
+    their log output here. A worker that dies is replaced. Once
+    `stop_signal` is set, the workers get SIGTERM and drain their
+    connections (SERVER_DRAIN_TIMEOUT); any still running after that are killed.
+    """
+    # Fresh interpreters rather than fork(): the GUI process holds a Tk connection and threads
+    context = multiprocessing.get_context('spawn')
+    settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    memory_budget = SERVER_MEMORY_BUDGET // workers
+    if STORAGE_MODE == 'encrypted':
+        load_storage_key()  # Create the storage key once, before the workers race to
+    # One pipe per worker rather than a shared queue, whose lock a killed worker could leave held
+    readers = {}
+
+    def spawn(index):
+        reader, writer = context.Pipe(duplex=False)
+        process = context.Process(
+            target=server_worker.run_worker,
+            args=(index, settings, HOST, PORT, private_key, save_directory, memory_budget, writer),
+            name=f"server-worker-{index}", daemon=True)
+        process.start()
+        writer.close()  # The worker holds the only write end, so its exit shows up as EOF
+        readers[reader] = index
+        return process
+
+    processes = []
+    try:
+        processes = [spawn(index) for index in range(workers)]
+        # Graceful start: report listening only once every worker has bound the port
+        listening = set()
+        deadline = time.monotonic() + SERVER_WORKER_START_TIMEOUT
+        while len(listening) < workers and not stop_signal.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not all(process.is_alive() for process in processes):
+                raise RuntimeError(f"Only {len(listening)} of {workers} worker processes started listening")
+            sentinels = [process.sentinel for process in processes]
+            listening.update(_forward_worker_output(readers, remaining, sentinels + [stop_signal]))
+        if not stop_signal.is_set():
+            print(f"[+] {workers} worker processes are serving {HOST}:{PORT} (SO_REUSEPORT).")
+
+        # Sleeps until a worker logs or exits, or the server is stopped
+        while not stop_signal.is_set():
+            sentinels = [process.sentinel for process in processes]
+            _forward_worker_output(readers, None, sentinels + [stop_signal])
+            for index, process in enumerate(processes):
+                if not process.is_alive() and not stop_signal.is_set():
+                    print(f"[!] Worker {index} exited with code {process.exitcode}; starting a replacement.")
+                    processes[index] = spawn(index)
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()  # SIGTERM: the worker stops accepting and drains its connections
+        # Workers cut off unfinished transfers at SERVER_DRAIN_TIMEOUT; allow a little longer to exit
+        deadline = time.monotonic() + SERVER_DRAIN_TIMEOUT + 5
+        while time.monotonic() < deadline:
+            sentinels = [process.sentinel for process in processes if process.is_alive()]
+            if not sentinels:
+                break
+            _forward_worker_output(readers, deadline - time.monotonic(), sentinels)
+        for process in processes:
+            if process.is_alive():
+                print(f"[!] Worker {process.name} did not stop in time; killing it.")
+                process.kill()
+            process.join()
+        _forward_worker_output(readers, 0)
+        for reader in readers:
+            reader.close()
+        print("[+] Worker processes stopped.")
+
+
+def serve_worker(save_directory, memory_budget, on_listening):
+    """
+    Runs one worker process of a multi-process server (see server_worker.py)
+    until the supervisor sends SIGTERM.
+    """
+    global _stop_signal
+    _stop_signal = StopSignal()
+    _init_server_state(save_directory, memory_budget)
+    signal.signal(signal.SIGTERM, _stop_on_signal)
+    _serve(save_directory, _stop_signal, reuse_port=True, on_listening=on_listening)
+
+
+def _stop_on_signal(signum, frame):
+    """SIGTERM handler of a supervisor or worker process: stop like stop_server() instead of dying mid-transfer."""
+    stop_signal = _stop_signal  # No lock: the interrupted thread may be holding it
+    if stop_signal is not None:
+        stop_signal.set()
+
+
+def is_running():
+    """Returns True while the server is running and has not been asked to stop."""
+    stop_signal = _stop_signal
+    return stop_signal is not None and not stop_signal.is_set()
+
+
+def start_server(save_directory=None, workers=None):
+    """
+    Starts the server to listen for incoming file transfers.
+    It generates RSA keys if they don't exist and serves every client
+    connection in its own thread. Connections are kept alive: each one
+    negotiates a cipher suite once, then carries any number of uploads
+    (encrypted file key + encrypted file), which are decrypted and saved,
+    and downloads of byte ranges from the save directory.
+
+    Blocks until the server is stopped and its connections have drained.
+
+    Args:
+        save_directory (str, optional): The directory where received files will be saved.
+                                        If None, files will be saved in a 'received_files'
+                                        subdirectory in the current working directory.
+        workers (int, optional): Number of server processes. Defaults to SERVER_WORKERS;
+                                 more than one requires SO_REUSEPORT.
+    """
+    global _stop_signal
+    with _state_lock:
+        if _stop_signal is not None:
+            print("[!] Server is already running.")
+            return
+        stop_signal = _stop_signal = StopSignal()
+
+    workers = SERVER_WORKERS if workers is None else workers
+    if workers > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+        print("[!] SO_REUSEPORT is not available on this platform; running a single server process.")
+        workers = 1
+
+    print(f"[+] Starting server on {HOST}:{PORT}...")
+    print(f"[+] Cipher suites by local throughput: {', '.join(preferred_cipher_suites())}")
+    try:
+        if workers > 1:
+            if threading.current_thread() is threading.main_thread():
+                # Being terminated must not orphan the workers: stop them like stop_server()
+                signal.signal(signal.SIGTERM, _stop_on_signal)
+            _supervise_workers(save_directory, workers, stop_signal)
+        else:
+            _init_server_state(save_directory, SERVER_MEMORY_BUDGET)
+            _serve(save_directory, stop_signal)
+    except Exception as e:
+        print(f"[!] Server startup error: {e}")
+    finally:
+        with _state_lock:
+            _stop_signal = None
+            stop_signal.close()
 
 def stop_server():
-    """Sets the global flag to stop the server's listening loop."""
-    global server_running, server_socket_instance
-    if server_running:
+    """
+    Signals the server to stop. The accept loop (or the worker supervisor)
+    wakes at once and idle connections close; transfers in progress get
+    SERVER_DRAIN_TIMEOUT seconds to finish. Returns without waiting: join
+    the thread running start_server() to know when the server is done.
+    """
+    with _state_lock:
+        stop_signal = _stop_signal
+        if stop_signal is None or stop_signal.is_set():
+            print("[!] Server is not running.")
+            return
         print("[*] Stopping server...")
-        server_running = False
-        # The start_server function's loop will exit due to the flag and timeout,
-        # and its finally block will close the socket.
-    else:
-        print("[!] Server is not running.")
+        stop_signal.set()
 
 if __name__ == '__main__':
     start_server()
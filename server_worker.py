@@ -0,0 +1,82 @@
+# server_worker.py
+#
+# Entry point of the worker processes of a multi-process server (see
+# SERVER_WORKERS in config.py). It lives apart from server.py because a
+# freshly spawned interpreter has to apply the supervisor's settings to
+# config before server, framing and crypto_utils import them by name.
+
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+
+
+class _PipeWriter:
+    """
+    Stands in for sys.stdout in a worker and forwards complete lines to the
+    supervisor. Connection threads print concurrently, and a pipe message
+    must not be interleaved with another, hence the lock.
+    """
+
+    def __init__(self, pipe):
+        self._pipe = pipe
+        self._buffer = ''
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        with self._lock:
+            self._buffer += text
+            while '\n' in self._buffer:
+                line, self._buffer = self._buffer.split('\n', 1)
+                self._send(('log', line))
+        return len(text)
+
+    def send_event(self, event):
+        with self._lock:
+            self._send(event)
+
+    def _send(self, event):
+        try:
+            self._pipe.send(event)
+        except OSError:
+            pass  # The supervisor is gone; _stop_with_supervisor is already stopping us
+
+    def flush(self):
+        pass
+
+
+def _stop_with_supervisor():
+    """Stops this worker (gracefully, via SIGTERM) if the supervisor exits without stopping it."""
+    multiprocessing.parent_process().join()
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+def run_worker(index, settings, host, port, private_key, save_directory, memory_budget, pipe):
+    """
+    Process target: serves connections on the shared port until the supervisor sends SIGTERM.
+
+    Args:
+        index (int): The worker's number, shown in its start and stop messages.
+        settings (dict): The supervisor's config settings, applied before anything imports them.
+        host (str): Address to bind.
+        port (int): Port to bind (shared with the other workers through SO_REUSEPORT).
+        private_key (bytes): The supervisor's RSA private key, so all workers decrypt the same file keys.
+        save_directory (str): Where received files are saved.
+        memory_budget (int): This worker's share of SERVER_MEMORY_BUDGET.
+        pipe (multiprocessing.connection.Connection): Carries ('log', line) and ('listening',)
+                                                      events to the supervisor.
+    """
+    import config
+    for name, value in settings.items():
+        setattr(config, name, value)
+    sys.stdout = _PipeWriter(pipe)
+
+    import server
+    server.HOST = host
+    server.PORT = port
+    server.private_key = private_key
+    threading.Thread(target=_stop_with_supervisor, daemon=True).start()
+    print(f"[+] Worker {index} started.")
+    server.serve_worker(save_directory, memory_budget, lambda: sys.stdout.send_event(('listening',)))
+    print(f"[+] Worker {index} stopped.")
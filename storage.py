@@ -0,0 +1,374 @@
+# storage.py
+#
+# Store-encrypted mode: uploads are kept on disk exactly as received (the
+# client's ciphertext), and decrypted only when a file is first read.
+#
+#   <save directory>/.encrypted/index.jsonl   One JSON record per stored upload
+#   <save directory>/.encrypted/<id>.bin      The ciphertext of that upload
+#   <save directory>/.encrypted/plain/<id>    Plaintext cache, created on first read and
+#                                             deleted once unread for STORAGE_CACHE_TTL seconds
+#
+# Index records hold the file key re-wrapped (AES-256-GCM) with a local
+# storage key, so stored files no longer depend on the server's RSA key.
+# The index is append-only; the last record for a name wins. A record with
+# "deleted": true drops the name (its upload was replaced by a plaintext copy).
+#
+#   python storage.py list received_files
+#   python storage.py export received_files report.pdf ./report.pdf
+#   python storage.py evict received_files
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from crypto_utils import get_cipher_suite
+from framing import recv_exactly
+from config import (
+    CHUNK_SIZE,
+    STORAGE_CACHE_TTL,
+    STORAGE_KEY_FILE
+)
+
+STORE_DIRECTORY = '.encrypted'
+INDEX_FILE = 'index.jsonl'
+PLAINTEXT_CACHE_DIRECTORY = 'plain'
+
+# Suite used to wrap file keys with the storage key
+KEY_WRAP_SUITE = 'AES-256-GCM'
+
+
+def load_storage_key(path=STORAGE_KEY_FILE):
+    """Loads the local storage key, generating it (readable by the owner only) if it does not exist."""
+    suite = get_cipher_suite(KEY_WRAP_SUITE)
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        key = suite.generate_key()
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(key)
+        print(f"[+] Generated storage key '{path}'.")
+        return key
+
+
+class EncryptedStore:
+    """
+    Keeps uploads encrypted at rest in one save directory. Thread-safe: the
+    server's connection threads store and read files concurrently.
+    """
+
+    def __init__(self, save_directory, storage_key):
+        self.directory = os.path.join(save_directory, STORE_DIRECTORY)
+        self.cache_directory = os.path.join(self.directory, PLAINTEXT_CACHE_DIRECTORY)
+        self.index_path = os.path.join(self.directory, INDEX_FILE)
+        self._storage_key = storage_key
+        self._wrap_suite = get_cipher_suite(KEY_WRAP_SUITE)
+        self._lock = threading.Lock()
+        self._decrypt_locks = {}
+        os.makedirs(self.cache_directory, exist_ok=True)
+        self._entries = {}
+        self._index_offset = 0
+        self._sweep_timer = None
+        self._refresh()
+        if os.listdir(self.cache_directory):
+            self._schedule_sweep()  # Plaintext left by an earlier run
+
+    def _refresh(self):
+        """
+        Reads index records appended since the last call, including those
+        written by other processes (the workers of a multi-process server
+        share one store). Caller holds the lock.
+        """
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                f.seek(self._index_offset)
+                for line in f:
+                    if not line.endswith('\n'):
+                        break  # Another process is still writing this record
+                    self._index_offset += len(line.encode('utf-8'))
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # A record cut short by a crash; the upload it described never completed
+                    if record.get("deleted"):
+                        self._entries.pop(record["name"], None)
+                    else:
+                        self._entries[record["name"]] = record
+        except FileNotFoundError:
+            pass
+
+    def _ciphertext_path(self, entry_id):
+        return os.path.join(self.directory, entry_id + '.bin')
+
+    def _cache_path(self, entry_id):
+        return os.path.join(self.cache_directory, entry_id)
+
+    def names(self):
+        with self._lock:
+            self._refresh()
+            return sorted(self._entries)
+
+    def __contains__(self, name):
+        with self._lock:
+            self._refresh()
+            return name in self._entries
+
+    def store_stream(self, conn, name, suite_name, file_key, size, chunker=None):
+        """
+        Receives `size` bytes of ciphertext from `conn` and stores them as they
+        are, without decrypting. The upload becomes visible under `name` once
+        it is complete and indexed, replacing any earlier upload of that name.
+
+        Args:
+            conn (socket.socket): The connection the ciphertext arrives on.
+            name (str): The (already sanitised) filename.
+            suite_name (str): The cipher suite the data is encrypted with.
+            file_key (bytes): The decrypted file key.
+            size (int): The ciphertext size in bytes.
+            chunker (AdaptiveChunker, optional): Sizes the socket reads.
+
+        Returns:
+            bytes: The SHA-256 digest of the stored ciphertext.
+        """
+        entry_id = uuid.uuid4().hex
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                remaining = size
+                while remaining:
+                    chunk_size = chunker.size if chunker is not None else CHUNK_SIZE
+                    chunk = recv_exactly(conn, min(remaining, chunk_size), CHUNK_SIZE, chunker)
+                    digest.update(chunk)
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            os.replace(temp_path, self._ciphertext_path(entry_id))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        record = {
+            "name": name,
+            "id": entry_id,
+            "suite": suite_name,
+            "key": self._wrap_suite.encrypt(file_key, self._storage_key).hex(),
+            "size": size,
+            "sha256": digest.hexdigest(),
+        }
+        with self._lock:
+            self._refresh()
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+            replaced = self._entries.get(name)
+            self._entries[name] = record
+            if replaced is not None:
+                self._decrypt_locks.pop(replaced["id"], None)
+        if replaced is not None:
+            self._remove_files(replaced["id"])
+        return digest.digest()
+
+    def discard(self, name):
+        """
+        Forgets the upload stored under `name`, if any, and deletes its files.
+        Used when a newer copy of the file is saved as plaintext (packed
+        uploads are), which would otherwise be hidden by the stored one.
+        """
+        with self._lock:
+            self._refresh()
+            record = self._entries.pop(name, None)
+            if record is None:
+                return
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"name": name, "deleted": True}) + "\n")
+            self._decrypt_locks.pop(record["id"], None)
+        self._remove_files(record["id"])
+
+    def _remove_files(self, entry_id):
+        for path in (self._ciphertext_path(entry_id), self._cache_path(entry_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _decrypt_to(self, record, destination):
+        """Decrypts a stored upload into `destination` (via a temporary file beside it)."""
+        suite = get_cipher_suite(record["suite"])
+        file_key = self._wrap_suite.decrypt(bytes.fromhex(record["key"]), self._storage_key)
+        decryptor = suite.decryptor(file_key)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(destination) or '.', suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as out, open(self._ciphertext_path(record["id"]), 'rb') as f:
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    out.write(decryptor.update(chunk))
+                out.write(decryptor.finalize())
+            os.replace(temp_path, destination)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def _lookup(self, name):
+        """Returns the index record stored under `name`, reading new index records first."""
+        with self._lock:
+            self._refresh()
+            record = self._entries.get(name)
+        if record is None:
+            raise FileNotFoundError(f"No stored file named '{name}'")
+        return record
+
+    def stat(self, name):
+        """
+        Returns the plaintext size and version of a stored file from its index
+        record, without decrypting it.
+
+        Returns:
+            tuple[int, int]: The size and version (see open_versioned), or None
+                if the suite pads its ciphertext (AES-256-CBC), so the size is
+                only known after decrypting.
+
+        Raises:
+            FileNotFoundError: If no upload is stored under `name`.
+        """
+        record = self._lookup(name)
+        size = get_cipher_suite(record["suite"]).plaintext_size(record["size"])
+        if size is None or size < 0:
+            return None  # Decrypting tells the size, or that the upload is malformed
+        return size, self._version(record)
+
+    def open(self, name):
+        """
+        Opens a stored file's plaintext for reading. The first access decrypts
+        it into the plaintext cache; later accesses read the cached copy until
+        it goes unread for STORAGE_CACHE_TTL seconds and is evicted.
+
+        Raises:
+            FileNotFoundError: If no upload is stored under `name`.
+        """
+        return self.open_versioned(name)[0]
+
+    def open_versioned(self, name):
+        """
+        Like open(), but also returns the upload's version: a number that
+        changes whenever `name` is replaced by a new upload.
+
+        Returns:
+            tuple[file, int]: The open plaintext and its version.
+        """
+        record = self._lookup(name)
+        with self._lock:
+            lock = self._decrypt_locks.setdefault(record["id"], threading.Lock())
+
+        cache_path = self._cache_path(record["id"])
+        # Concurrent readers of the same file (e.g. parallel download ranges) decrypt it
+        # once; the lock also keeps eviction from deleting it between the check and the open
+        with lock:
+            if not os.path.exists(cache_path):
+                self._decrypt_to(record, cache_path)
+                print(f"[+] Decrypted stored file '{name}' on first access.")
+            else:
+                os.utime(cache_path)  # Last read, as seen by eviction in every worker process
+            f = open(cache_path, 'rb')
+        self._schedule_sweep()
+        return f, self._version(record)
+
+    @staticmethod
+    def _version(record):
+        # Every upload gets a fresh random id
+        return int(record["id"][:16], 16)
+
+    def export(self, name, destination):
+        """Decrypts a stored file to `destination`, without leaving plaintext in the cache."""
+        self._decrypt_to(self._lookup(name), destination)
+
+    def evict_cache(self, max_age=0):
+        """
+        Deletes cached plaintext that has not been read for `max_age` seconds
+        (all of it by default); those files are decrypted again on their next access.
+
+        Returns:
+            bool: True if cached plaintext remains.
+        """
+        cutoff = time.time() - max_age
+        remaining = False
+        for entry_id in os.listdir(self.cache_directory):
+            if entry_id.endswith('.part'):
+                continue  # A decryption in progress
+            with self._lock:
+                lock = self._decrypt_locks.setdefault(entry_id, threading.Lock())
+            path = self._cache_path(entry_id)
+            with lock:
+                try:
+                    if os.path.getmtime(path) > cutoff:
+                        remaining = True
+                    else:
+                        os.remove(path)
+                        # The next read decrypts again and registers a new lock; a reader
+                        # already waiting on this one just repeats the decryption
+                        with self._lock:
+                            self._decrypt_locks.pop(entry_id, None)
+                except FileNotFoundError:
+                    with self._lock:
+                        self._decrypt_locks.pop(entry_id, None)  # Evicted by another worker process
+                except OSError:
+                    remaining = True  # Still open for reading (Windows)
+        return remaining
+
+    def _schedule_sweep(self):
+        """Starts the eviction timer, unless it is already pending."""
+        with self._lock:
+            if self._sweep_timer is not None:
+                return
+            self._sweep_timer = threading.Timer(STORAGE_CACHE_TTL, self._sweep)
+            self._sweep_timer.daemon = True
+            self._sweep_timer.start()
+
+    def _sweep(self):
+        """
+        Timer callback: evicts plaintext unread for STORAGE_CACHE_TTL seconds,
+        and runs again while any is left. A cached file is therefore deleted
+        between one and two TTLs after its last read, and an idle store with
+        an empty cache has no timer running.
+        """
+        with self._lock:
+            self._sweep_timer = None
+        if self.evict_cache(STORAGE_CACHE_TTL):
+            self._schedule_sweep()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and export files kept in store-encrypted mode.")
+    parser.add_argument('--key', default=STORAGE_KEY_FILE, help="Storage key file")
+    commands = parser.add_subparsers(dest='command', required=True)
+    list_parser = commands.add_parser('list', help="List stored files")
+    list_parser.add_argument('save_directory')
+    export_parser = commands.add_parser('export', help="Decrypt a stored file")
+    export_parser.add_argument('save_directory')
+    export_parser.add_argument('name')
+    export_parser.add_argument('destination')
+    evict_parser = commands.add_parser('evict', help="Delete all cached plaintext")
+    evict_parser.add_argument('save_directory')
+    args = parser.parse_args(argv)
+
+    with open(args.key, 'rb') as f:
+        store = EncryptedStore(args.save_directory, f.read())
+    if args.command == 'list':
+        for name in store.names():
+            print(name)
+    elif args.command == 'export':
+        store.export(args.name, args.destination)
+        print(f"[+] Exported '{args.name}' to '{args.destination}'.")
+    else:
+        store.evict_cache()
+        print("[+] Plaintext cache cleared.")
+
+
+if __name__ == '__main__':
+    main()
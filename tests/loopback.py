@@ -0,0 +1,138 @@
+# loopback.py
+#
+# Shared fixture of the loopback tests: a real server runs in a thread on
+# 127.0.0.1 and a FileTransferClient talks to it. Keys and received files
+# live in a temporary directory, which is also the working directory while
+# the tests run (server.py creates its RSA key pair there on import, and
+# refers to it by relative path afterwards).
+
+import atexit
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import framing  # noqa: E402
+
+server = None
+client = None
+work_directory = None
+
+
+def set_up():
+    """
+    Moves into the temporary working directory and imports the server and
+    client modules. Called by every loopback test class; only the first
+    call does anything, and the directory is removed when the process exits.
+    """
+    global server, client, work_directory
+    if work_directory is not None:
+        return
+    original_directory = os.getcwd()
+    work_directory = tempfile.mkdtemp(prefix='protocol_tests_')
+    os.chdir(work_directory)
+    atexit.register(shutil.rmtree, work_directory, True)
+    atexit.register(os.chdir, original_directory)  # Runs first: the directory can then be removed
+    import server as server_module
+    import client as client_module
+    server, client = server_module, client_module
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def send_hello(sock):
+    """Sends the handshake's hello on a raw connection, offering every suite the client supports."""
+    suites = [name.encode('ascii') for name in client.preferred_cipher_suites()]
+    framing.send_buffers(sock, [framing.u8(len(suites))] + [framing.u8(len(name)) + name for name in suites])
+
+
+def _probe(port):
+    """
+    Completes a handshake with the server and closes the connection cleanly.
+    Returns once the server has closed its end, so the probe no longer counts
+    against the per-client connection limit when the tests start.
+    """
+    with socket.create_connection(('127.0.0.1', port), timeout=5) as sock:
+        send_hello(sock)
+        if framing.recv_u8(sock) != framing.HELLO_OK:
+            raise ConnectionError("Server refused the test handshake")
+        framing.recv_exactly(sock, framing.recv_u8(sock))
+        framing.send_buffers(sock, [framing.u8(framing.MSG_CLOSE)])
+        while sock.recv(1):
+            pass
+
+
+def start_server_thread(save_directory):
+    """
+    Runs server.start_server() in a thread on a free port of 127.0.0.1.
+
+    Returns:
+        tuple[int, threading.Thread]: The port and the server thread, once it accepts connections.
+    """
+    set_up()
+    server.HOST = '127.0.0.1'
+    server.PORT = port = free_port()
+    server_thread = threading.Thread(target=server.start_server, args=(save_directory, 1))
+    server_thread.start()
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            _probe(port)
+            return port, server_thread
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+class LoopbackTestCase(unittest.TestCase):
+    """Starts a server for the test class and gives each test a fresh client."""
+
+    @classmethod
+    def setUpClass(cls):
+        set_up()
+        cls.save_directory = tempfile.mkdtemp(prefix='received_', dir=work_directory)
+        cls.port, cls.server_thread = start_server_thread(cls.save_directory)
+
+    @classmethod
+    def tearDownClass(cls):
+        server.stop_server()
+        cls.server_thread.join(30)
+
+    def setUp(self):
+        with open(server.PUBLIC_KEY_FILE, 'rb') as f:
+            public_key = f.read()
+        self.client = client.FileTransferClient(host='127.0.0.1', port=self.port, public_key=public_key)
+        self.connects = 0
+        connect = self.client._connect
+
+        def counting_connect():
+            self.connects += 1
+            return connect()
+        self.client._connect = counting_connect
+
+    def tearDown(self):
+        self.client.close()
+
+    def patch_server(self, name, replacement):
+        original = getattr(server, name)
+        setattr(server, name, replacement)
+        self.addCleanup(setattr, server, name, original)
+        return original
+
+    def saved(self, name):
+        with open(os.path.join(self.save_directory, name), 'rb') as f:
+            return f.read()
+
+    def temporary_directory(self, prefix):
+        return tempfile.mkdtemp(prefix=prefix, dir=work_directory)
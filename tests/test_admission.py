@@ -0,0 +1,123 @@
+# test_admission.py
+#
+# Tests of AdmissionController, and loopback tests of the limits the server
+# applies before reading a client's data (see loopback.py for the fixture).
+#
+#   python -m pytest tests
+#   python -m unittest discover -s tests
+
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import framing  # noqa: E402
+import loopback  # noqa: E402
+from admission import AdmissionController  # noqa: E402
+from loopback import LoopbackTestCase  # noqa: E402
+
+
+class ConnectionLimitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.controller = AdmissionController(memory_budget=1000, max_connections_per_client=2)
+
+    def test_limits_connections_per_client(self):
+        self.assertTrue(self.controller.admit_connection('10.0.0.1'))
+        self.assertTrue(self.controller.admit_connection('10.0.0.1'))
+        self.assertFalse(self.controller.admit_connection('10.0.0.1'))
+        self.assertTrue(self.controller.admit_connection('10.0.0.2'))  # Other clients are counted apart
+
+    def test_release_frees_a_slot(self):
+        self.controller.admit_connection('10.0.0.1')
+        self.controller.admit_connection('10.0.0.1')
+        self.controller.release_connection('10.0.0.1')
+        self.assertTrue(self.controller.admit_connection('10.0.0.1'))
+        self.assertFalse(self.controller.admit_connection('10.0.0.1'))
+
+
+class MemoryBudgetTests(unittest.TestCase):
+
+    def setUp(self):
+        self.controller = AdmissionController(memory_budget=1000, max_connections_per_client=2)
+
+    def test_reserves_within_budget(self):
+        self.assertTrue(self.controller.reserve_memory(600))
+        self.assertTrue(self.controller.reserve_memory(400))
+        self.assertEqual(self.controller.in_flight_bytes, 1000)
+        self.controller.release_memory(600)
+        self.assertEqual(self.controller.in_flight_bytes, 400)
+
+    def test_refuses_more_than_budget_at_once(self):
+        start = time.monotonic()
+        self.assertFalse(self.controller.reserve_memory(1001))  # Could never fit: no waiting
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(self.controller.in_flight_bytes, 0)
+
+    def test_wait_times_out_when_budget_stays_full(self):
+        self.controller.reserve_memory(800)
+        start = time.monotonic()
+        self.assertFalse(self.controller.reserve_memory(300, timeout=0.1))
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        self.assertEqual(self.controller.in_flight_bytes, 800)
+
+    def test_waiter_proceeds_when_memory_is_released(self):
+        self.controller.reserve_memory(800)
+        threading.Timer(0.05, self.controller.release_memory, args=(800,)).start()
+        self.assertTrue(self.controller.reserve_memory(300, timeout=10))
+        self.assertEqual(self.controller.in_flight_bytes, 300)
+
+
+class ServerLimitTests(LoopbackTestCase):
+
+    def connect(self):
+        """Opens a raw connection and sends the hello, offering every suite."""
+        sock = socket.create_connection(('127.0.0.1', self.port), timeout=10)
+        self.addCleanup(sock.close)
+        loopback.send_hello(sock)
+        return sock
+
+    def negotiate(self, sock):
+        self.assertEqual(framing.recv_u8(sock), framing.HELLO_OK)
+        framing.recv_exactly(sock, framing.recv_u8(sock))
+
+    def assert_closed(self, sock):
+        try:
+            self.assertEqual(sock.recv(1), b'')
+        except ConnectionResetError:
+            pass
+
+    def test_extra_connection_of_a_client_is_answered_busy(self):
+        controller = loopback.server.admission_controller
+        limit = controller.max_connections_per_client
+        controller.max_connections_per_client = 1
+        self.addCleanup(setattr, controller, 'max_connections_per_client', limit)
+
+        self.negotiate(self.connect())
+        busy = self.connect()
+        self.assertEqual(framing.recv_u8(busy), framing.HELLO_BUSY)
+        self.assertGreater(framing.recv_u32(busy), 0)  # Retry-after in milliseconds
+        self.assert_closed(busy)
+
+    def test_oversized_name_closes_connection_unread(self):
+        sock = self.connect()
+        self.negotiate(sock)
+        # Announces a 2 GiB filename; the server must not try to buffer it
+        framing.send_buffers(sock, [framing.u8(framing.MSG_FILE), framing.u32(0), framing.u32(1 << 31)])
+        self.assert_closed(sock)
+
+    def test_oversized_key_closes_connection_unread(self):
+        sock = self.connect()
+        self.negotiate(sock)
+        name = b'key.bin'
+        framing.send_buffers(sock, [framing.u8(framing.MSG_FILE), framing.u32(0),
+                                    framing.u32(len(name)), name, framing.u32(1 << 31)])
+        self.assert_closed(sock)
+
+
+if __name__ == '__main__':
+    unittest.main()
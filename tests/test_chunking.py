@@ -0,0 +1,77 @@
+# test_chunking.py
+#
+# Tests of AdaptiveChunker, which sizes each connection's socket reads.
+#
+#   python -m pytest tests
+#   python -m unittest discover -s tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from framing import AdaptiveChunker  # noqa: E402
+
+KIB = 1024
+
+
+class AdaptiveChunkerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.chunker = AdaptiveChunker(initial=16 * KIB, minimum=4 * KIB, maximum=64 * KIB, window=4)
+
+    def feed(self, fill, seconds_per_read=0.001):
+        """Records one window of reads that each fill `fill` of the current chunk size."""
+        size = self.chunker.size
+        for _ in range(self.chunker.window):
+            self.chunker.record(size, int(size * fill), seconds_per_read)
+
+    def test_full_reads_grow_up_to_maximum(self):
+        self.feed(1.0)
+        self.assertEqual(self.chunker.size, 32 * KIB)
+        self.feed(1.0, seconds_per_read=0.002)  # Twice the bytes in twice the time: same throughput
+        self.assertEqual(self.chunker.size, 64 * KIB)
+        self.feed(1.0, seconds_per_read=0.004)
+        self.assertEqual(self.chunker.size, 64 * KIB)
+
+    def test_size_changes_only_at_window_end(self):
+        for _ in range(self.chunker.window - 1):
+            self.chunker.record(16 * KIB, 16 * KIB, 0.001)
+        self.assertEqual(self.chunker.size, 16 * KIB)
+
+    def test_empty_reads_shrink_down_to_minimum(self):
+        for expected in (8 * KIB, 4 * KIB, 4 * KIB):
+            self.feed(0.1)
+            self.assertEqual(self.chunker.size, expected)
+
+    def test_partial_reads_keep_size(self):
+        self.feed(0.5)
+        self.assertEqual(self.chunker.size, 16 * KIB)
+
+    def test_fill_counts_reads_capped_by_message_end(self):
+        # Short reads because messages end (1 KiB each) are not "data queued in the kernel"
+        for _ in range(self.chunker.window):
+            self.chunker.record(self.chunker.size, KIB, 0.001)
+        self.assertEqual(self.chunker.size, 8 * KIB)
+
+    def test_grow_that_lowers_throughput_is_undone(self):
+        self.feed(1.0)
+        self.assertEqual(self.chunker.size, 32 * KIB)
+        self.feed(1.0, seconds_per_read=0.004)  # Half the throughput of the first window
+        self.assertEqual(self.chunker.size, 16 * KIB)
+        self.feed(1.0)  # Still filling, but growing past 16 KiB did not pay off
+        self.assertEqual(self.chunker.size, 16 * KIB)
+
+    def test_shrink_lifts_growth_limit(self):
+        self.feed(1.0)
+        self.feed(1.0, seconds_per_read=0.004)
+        self.feed(0.1)
+        self.assertEqual(self.chunker.size, 8 * KIB)
+        self.feed(1.0)
+        self.feed(1.0, seconds_per_read=0.002)
+        self.assertEqual(self.chunker.size, 32 * KIB)
+
+
+if __name__ == '__main__':
+    unittest.main()
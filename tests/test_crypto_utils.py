@@ -0,0 +1,97 @@
+# test_crypto_utils.py
+#
+# Tests of cipher-suite negotiation and of the AES-256-CBC suite's checks
+# on ciphertext length and padding.
+#
+#   python -m pytest tests
+#   python -m unittest discover -s tests
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Crypto.Cipher import AES  # noqa: E402
+
+import crypto_utils  # noqa: E402
+
+GCM = 'AES-256-GCM'
+CHACHA = 'CHACHA20-POLY1305'
+CBC = 'AES-256-CBC'
+
+
+class NegotiationTests(unittest.TestCase):
+
+    def setUp(self):
+        # A fixed local ranking instead of this machine's benchmark
+        patcher = mock.patch.object(crypto_utils, '_preferred_suites', [GCM, CHACHA, CBC])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_picks_best_combined_rank(self):
+        # GCM: 1 + 0, CBC: 0 + 2, ChaCha20: 2 + 1
+        self.assertEqual(crypto_utils.negotiate_cipher_suite([CBC, GCM, CHACHA]), GCM)
+        # ChaCha20: 0 + 1, CBC: 1 + 2
+        self.assertEqual(crypto_utils.negotiate_cipher_suite([CHACHA, CBC]), CHACHA)
+
+    def test_tie_goes_to_local_ranking(self):
+        # ChaCha20: 0 + 1, GCM: 1 + 0
+        self.assertEqual(crypto_utils.negotiate_cipher_suite([CHACHA, GCM]), GCM)
+
+    def test_ignores_unknown_suites(self):
+        self.assertEqual(crypto_utils.negotiate_cipher_suite(['ROT13', 'DES', CBC]), CBC)
+
+    def test_rejects_no_common_suite(self):
+        with self.assertRaises(ValueError):
+            crypto_utils.negotiate_cipher_suite(['ROT13'])
+        with self.assertRaises(ValueError):
+            crypto_utils.negotiate_cipher_suite([])
+
+
+class CBCSuiteTests(unittest.TestCase):
+
+    def setUp(self):
+        self.suite = crypto_utils.get_cipher_suite(CBC)
+        self.key = self.suite.generate_key()
+
+    def decrypt_streamed(self, encrypted_data, piece_size=7):
+        decryptor = self.suite.decryptor(self.key)
+        plaintext = b''.join(decryptor.update(encrypted_data[i:i + piece_size])
+                             for i in range(0, len(encrypted_data), piece_size))
+        return plaintext + decryptor.finalize()
+
+    def encrypt_raw(self, padded_plaintext):
+        """Encrypts without adding padding, so the test controls the last block."""
+        cipher = AES.new(self.key, AES.MODE_CBC)
+        return cipher.iv + cipher.encrypt(padded_plaintext)
+
+    def assert_rejected(self, encrypted_data):
+        with self.assertRaises(ValueError):
+            self.suite.decrypt(encrypted_data, self.key)
+        with self.assertRaises(ValueError):
+            self.decrypt_streamed(encrypted_data)
+
+    def test_round_trip(self):
+        for size in (0, 1, 15, 16, 17, 1000):
+            data = os.urandom(size)
+            encrypted_data = self.suite.encrypt(data, self.key)
+            self.assertEqual(self.suite.decrypt(encrypted_data, self.key), data)
+            self.assertEqual(self.decrypt_streamed(encrypted_data), data)
+
+    def test_rejects_bad_length(self):
+        encrypted_data = self.suite.encrypt(os.urandom(40), self.key)
+        self.assert_rejected(b'')
+        self.assert_rejected(encrypted_data[:16])  # IV only
+        self.assert_rejected(encrypted_data[:-1])
+        self.assert_rejected(encrypted_data + b'\0')
+
+    def test_rejects_bad_padding(self):
+        self.assert_rejected(self.encrypt_raw(b'A' * 16))  # Padding length 0x41
+        self.assert_rejected(self.encrypt_raw(b'A' * 15 + b'\0'))  # Padding length 0
+        self.assert_rejected(self.encrypt_raw(b'A' * 14 + b'\x01\x02'))  # Padding bytes disagree
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+# test_download.py
+#
+# Loopback tests of parallel, resumable downloads (see loopback.py for the fixture).
+#
+#   python -m pytest tests
+#   python -m unittest discover -s tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import loopback  # noqa: E402
+from loopback import LoopbackTestCase  # noqa: E402
+
+
+class DownloadTests(LoopbackTestCase):
+
+    def test_interrupted_download_resumes_missing_ranges(self):
+        data = os.urandom(5 * 64 * 1024 + 123)
+        self.client.send_data('resume.bin', data)
+        destination = self.temporary_directory('downloads_')
+        send_range = self.patch_server('_send_range', self.dropping_after(2))
+
+        with self.assertRaises(OSError):
+            self.client.download_file('resume.bin', destination, parallel=1, range_size=64 * 1024)
+        self.assertTrue(os.path.exists(os.path.join(destination, 'resume.bin.part.json')))
+
+        resumed = []
+        loopback.server._send_range = lambda conn, *args: resumed.append(1) or send_range(conn, *args)
+        path = self.client.download_file('resume.bin', destination, parallel=1, range_size=64 * 1024)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(len(resumed), 4)  # 6 ranges, 2 fetched before the interruption
+        self.assertFalse(os.path.exists(path + '.part.json'))
+
+    def test_replaced_file_is_not_resumed(self):
+        self.client.send_data('replaced.bin', os.urandom(3 * 64 * 1024))
+        destination = self.temporary_directory('downloads_')
+        send_range = self.patch_server('_send_range', self.dropping_after(1))
+        with self.assertRaises(OSError):
+            self.client.download_file('replaced.bin', destination, parallel=1, range_size=64 * 1024)
+
+        replacement = os.urandom(3 * 64 * 1024)  # Same size, so only the version tells them apart
+        self.client.send_data('replaced.bin', replacement)
+        requests = []
+        loopback.server._send_range = lambda conn, *args: requests.append(1) or send_range(conn, *args)
+        path = self.client.download_file('replaced.bin', destination, parallel=1, range_size=64 * 1024)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), replacement)
+        self.assertEqual(len(requests), 3)
+
+    def test_replacement_during_download_is_rejected(self):
+        self.client.send_data('changing.bin', os.urandom(3 * 64 * 1024))
+        destination = self.temporary_directory('downloads_')
+        replacement = os.urandom(3 * 64 * 1024)
+        requests = []
+
+        def replacing_send_range(conn, *args):
+            requests.append(1)
+            if len(requests) == 2:
+                replacement_path = os.path.join(self.save_directory, 'changing.bin.new')
+                with open(replacement_path, 'wb') as f:
+                    f.write(replacement)
+                os.replace(replacement_path, os.path.join(self.save_directory, 'changing.bin'))
+            send_range(conn, *args)
+        send_range = self.patch_server('_send_range', replacing_send_range)
+
+        with self.assertRaises(loopback.client.FileChangedError):
+            self.client.download_file('changing.bin', destination, parallel=1, range_size=64 * 1024)
+        self.assertEqual(os.listdir(destination), [])  # The ranges of the old version are discarded
+
+        path = self.client.download_file('changing.bin', destination, parallel=1, range_size=64 * 1024)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), replacement)
+
+    @staticmethod
+    def dropping_after(count):
+        """A _send_range that drops the connection on every request after the first `count`."""
+        send_range = loopback.server._send_range
+        requests = []
+
+        def failing_send_range(conn, *args):
+            requests.append(1)
+            if len(requests) > count:
+                raise ConnectionError("Dropped by the test")
+            send_range(conn, *args)
+        return failing_send_range
+
+
+if __name__ == '__main__':
+    unittest.main()
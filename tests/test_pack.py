@@ -0,0 +1,48 @@
+# test_pack.py
+#
+# Tests of the packed-container format that carries small files in one upload.
+#
+#   python -m pytest tests
+#   python -m unittest discover -s tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import framing  # noqa: E402
+
+
+class PackFormatTests(unittest.TestCase):
+
+    def test_round_trip(self):
+        entries = [(b'a.txt', b'alpha'), (b'empty', b''), ('été.txt'.encode('utf-8'), b'x' * 1000)]
+        parsed = framing.parse_pack(framing.build_pack(entries))
+        self.assertEqual([(name.encode('utf-8'), bytes(data)) for name, data in parsed], entries)
+
+    def test_rejects_truncated_header(self):
+        with self.assertRaises(ValueError):
+            framing.parse_pack(b'\0\0')
+
+    def test_rejects_truncated_index(self):
+        container = framing.build_pack([(b'a.txt', b'alpha'), (b'b.txt', b'beta')])
+        with self.assertRaises(ValueError):
+            framing.parse_pack(container[:4 + 2 + 3])
+        # An entry count far beyond what the container holds
+        with self.assertRaises(ValueError):
+            framing.parse_pack(framing.u32(0xFFFFFFFF) + container[4:])
+
+    def test_rejects_index_that_does_not_match_data(self):
+        container = framing.build_pack([(b'a.txt', b'alpha')])
+        oversized = container.replace(framing.u64(5), framing.u64(1 << 40))
+        with self.assertRaises(ValueError):
+            framing.parse_pack(oversized)
+        with self.assertRaises(ValueError):
+            framing.parse_pack(container[:-1])
+        with self.assertRaises(ValueError):
+            framing.parse_pack(container + b'trailing')
+
+
+if __name__ == '__main__':
+    unittest.main()
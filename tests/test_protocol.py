@@ -0,0 +1,71 @@
+# test_protocol.py
+#
+# Loopback tests of the wire protocol (see loopback.py for the fixture).
+#
+#   python -m pytest tests
+#   python -m unittest discover -s tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import loopback  # noqa: E402
+from loopback import LoopbackTestCase  # noqa: E402
+
+
+class AcknowledgementTests(LoopbackTestCase):
+
+    def test_rejected_upload_does_not_desync_connection(self):
+        payload = os.urandom(100_000)
+        with self.assertRaises(loopback.client.TransferRejectedError):
+            self.client.send_data('..', payload)  # Rejected before its data is read; the data is discarded
+        self.client.send_data('after_nack.bin', payload)
+        self.assertEqual(self.saved('after_nack.bin'), payload)
+        self.assertEqual(self.connects, 1)
+
+    def test_nack_in_pipeline_is_matched_to_its_upload(self):
+        entries = [('first.txt', b'first'), ('..', b'rejected'), ('last.txt', b'last')]
+        # A 1-byte limit puts every file in its own container, all in flight together
+        with self.assertRaises(loopback.client.TransferRejectedError) as raised:
+            self.client.send_packed(entries, max_pack_bytes=1)
+        self.assertEqual(raised.exception.saved, 2)
+        self.assertEqual(len(raised.exception.failures), 1)
+        self.assertEqual(self.saved('first.txt'), b'first')
+        self.assertEqual(self.saved('last.txt'), b'last')
+        self.assertEqual(self.connects, 1)
+
+    def test_unacknowledged_uploads_are_resent_after_dropped_connection(self):
+        self.client.send_data('warm.bin', b'warm')  # The batch then runs on a reused connection, which is retried
+        received = []
+        receive_file = self.patch_server('_receive_file', lambda conn, *args: received.append(1) or receive_file(conn, *args))
+        acks = []
+
+        def dropping_send_ack(conn, *args, **kwargs):
+            acks.append(1)
+            if len(acks) == 3:
+                raise ConnectionError("Dropped by the test")  # The handler closes the connection
+            send_ack(conn, *args, **kwargs)
+        send_ack = self.patch_server('_send_ack', dropping_send_ack)
+
+        payloads = {f'file_{i}.bin': os.urandom(10_000) for i in range(12)}
+        paths = []
+        source_directory = self.temporary_directory('source_')
+        for name, data in payloads.items():
+            paths.append(os.path.join(source_directory, name))
+            with open(paths[-1], 'wb') as f:
+                f.write(data)
+
+        self.assertEqual(self.client.send_files(paths, window=8), len(payloads))
+        for name, data in payloads.items():
+            self.assertEqual(self.saved(name), data)
+        self.assertEqual(self.connects, 2)
+        # Only the unacknowledged uploads were sent again: the third was saved but lost its ack,
+        # so it arrived twice, and the ones in flight behind it never reached the server the first time
+        self.assertEqual(len(received), len(payloads) + 1)
+        self.assertEqual(len(acks), len(received))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+# test_shutdown.py
+#
+# Tests of StopSignal and of how the server stops: idle connections close at
+# once, transfers in progress may finish, and transfers that outlast the
+# drain deadline are cut off (see loopback.py for the fixture).
+#
+#   python -m pytest tests
+#   python -m unittest discover -s tests
+
+import os
+import selectors
+import socket
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crypto_utils  # noqa: E402
+import framing  # noqa: E402
+import loopback  # noqa: E402
+
+
+class StopSignalTests(unittest.TestCase):
+
+    def setUp(self):
+        loopback.set_up()
+        self.signal = loopback.server.StopSignal()
+        self.addCleanup(self.signal.close)
+
+    def wait(self, timeout=0):
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.signal, selectors.EVENT_READ)
+            return bool(selector.select(timeout))
+
+    def test_unset_signal_is_not_readable(self):
+        self.assertFalse(self.signal.is_set())
+        self.assertFalse(self.wait(0.05))
+
+    def test_set_wakes_every_waiter(self):
+        self.signal.set()
+        self.assertTrue(self.signal.is_set())
+        # The byte is never consumed, so later waiters wake too
+        self.assertTrue(self.wait())
+        self.assertTrue(self.wait())
+
+    def test_set_is_safe_to_repeat_and_after_close(self):
+        self.signal.set()
+        self.signal.set()
+        self.signal.close()
+        self.signal.set()
+        self.assertTrue(self.signal.is_set())
+
+
+class ShutdownTests(unittest.TestCase):
+
+    def setUp(self):
+        loopback.set_up()
+        self.server = loopback.server
+        self.save_directory = tempfile.mkdtemp(prefix='received_', dir=loopback.work_directory)
+        self.port, self.server_thread = loopback.start_server_thread(self.save_directory)
+        self.addCleanup(self.server_thread.join, 30)
+        self.addCleanup(lambda: self.server.is_running() and self.server.stop_server())
+
+    def connect(self):
+        """Opens a raw connection and completes the handshake; returns it and the agreed suite."""
+        sock = socket.create_connection(('127.0.0.1', self.port), timeout=10)
+        self.addCleanup(sock.close)
+        loopback.send_hello(sock)
+        self.assertEqual(framing.recv_u8(sock), framing.HELLO_OK)
+        suite_name = framing.recv_exactly(sock, framing.recv_u8(sock)).decode('ascii')
+        return sock, crypto_utils.get_cipher_suite(suite_name)
+
+    def start_upload(self, sock, suite, name, data):
+        """Sends a MSG_FILE upload of `data` except for its last byte; returns that byte."""
+        with open(self.server.PUBLIC_KEY_FILE, 'rb') as f:
+            public_key = f.read()
+        file_key = suite.generate_key()
+        encrypted_key = crypto_utils.rsa_encrypt(file_key, public_key)
+        encrypted_data = suite.encrypt(data, file_key)
+        framing.send_buffers(sock, [
+            framing.u8(framing.MSG_FILE), framing.u32(0),
+            framing.u32(len(name)), name,
+            framing.u32(len(encrypted_key)), encrypted_key,
+            framing.u64(len(encrypted_data)), encrypted_data[:-1],
+        ])
+        return encrypted_data[-1:]
+
+    def stop_and_time(self):
+        start = time.monotonic()
+        self.server.stop_server()
+        self.assertFalse(self.server.is_running())
+        self.server_thread.join(30)
+        self.assertFalse(self.server_thread.is_alive())
+        return time.monotonic() - start
+
+    def test_idle_connections_close_at_once(self):
+        sock, _ = self.connect()
+        self.assertLess(self.stop_and_time(), 2)
+        self.assertEqual(sock.recv(1), b'')
+
+    def test_transfer_in_progress_finishes(self):
+        sock, suite = self.connect()
+        data = os.urandom(10_000)
+        last_byte = self.start_upload(sock, suite, b'draining.bin', data)
+        time.sleep(0.1)  # Let the handler start reading the upload
+        self.server.stop_server()
+        sock.sendall(last_byte)
+        self.assertEqual(framing.recv_u8(sock), framing.MSG_ACK)
+        framing.recv_u32(sock)
+        self.assertEqual(framing.recv_u8(sock), framing.STATUS_OK)
+        self.server_thread.join(30)
+        with open(os.path.join(self.save_directory, 'draining.bin'), 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_stalled_transfer_is_cut_off_at_drain_deadline(self):
+        drain_timeout = self.server.SERVER_DRAIN_TIMEOUT
+        self.server.SERVER_DRAIN_TIMEOUT = 0.5
+        self.addCleanup(setattr, self.server, 'SERVER_DRAIN_TIMEOUT', drain_timeout)
+        sock, suite = self.connect()
+        self.start_upload(sock, suite, b'stalled.bin', os.urandom(10_000))  # The last byte never comes
+        time.sleep(0.1)
+
+        elapsed = self.stop_and_time()
+        self.assertGreaterEqual(elapsed, 0.5)
+        self.assertLess(elapsed, 5)
+        try:
+            self.assertEqual(sock.recv(1), b'')
+        except ConnectionResetError:
+            pass
+        self.assertFalse(os.path.exists(os.path.join(self.save_directory, 'stalled.bin')))
+
+
+if __name__ == '__main__':
+    unittest.main()
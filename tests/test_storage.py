@@ -0,0 +1,124 @@
+# test_storage.py
+#
+# Tests of EncryptedStore, which keeps uploads encrypted at rest in
+# store-encrypted mode.
+#
+#   python -m pytest tests
+#   python -m unittest discover -s tests
+
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crypto_utils  # noqa: E402
+from storage import EncryptedStore  # noqa: E402
+
+
+class EncryptedStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.save_directory = tempfile.mkdtemp(prefix='store_tests_')
+        self.addCleanup(shutil.rmtree, self.save_directory, True)
+        self.storage_key = os.urandom(32)
+        self.store = self.open_store()
+
+    def open_store(self):
+        store = EncryptedStore(self.save_directory, self.storage_key)
+        self.addCleanup(lambda: store._sweep_timer and store._sweep_timer.cancel())
+        return store
+
+    def upload(self, name, data, suite_name='AES-256-GCM'):
+        """Stores `data` under `name` as a client's upload would arrive: encrypted, over a socket."""
+        suite = crypto_utils.get_cipher_suite(suite_name)
+        file_key = suite.generate_key()
+        ciphertext = suite.encrypt(data, file_key)
+        sender, receiver = socket.socketpair()
+        with sender, receiver:
+            sender.sendall(ciphertext)
+            self.store.store_stream(receiver, name, suite_name, file_key, len(ciphertext))
+
+    def read(self, name):
+        with self.store.open(name) as f:
+            return f.read()
+
+    def cached(self):
+        return os.listdir(self.store.cache_directory)
+
+    def stored_ciphertexts(self):
+        return [name for name in os.listdir(self.store.directory) if name.endswith('.bin')]
+
+    def test_open_decrypts_once_into_cache(self):
+        self.upload('a.txt', b'alpha')
+        self.assertEqual(self.cached(), [])
+        self.assertEqual(self.read('a.txt'), b'alpha')
+        self.assertEqual(len(self.cached()), 1)
+        self.assertEqual(self.read('a.txt'), b'alpha')
+        self.assertEqual(len(self.cached()), 1)
+
+    def test_stat_of_aead_upload_reads_index_only(self):
+        for suite_name in ('AES-256-GCM', 'CHACHA20-POLY1305'):
+            self.upload(suite_name, b'x' * 1000, suite_name)
+            size, version = self.store.stat(suite_name)
+            self.assertEqual(size, 1000)
+            self.assertEqual(self.cached(), [])
+            f, opened_version = self.store.open_versioned(suite_name)
+            f.close()
+            self.assertEqual(opened_version, version)
+            self.store.evict_cache()
+
+    def test_stat_of_cbc_upload_needs_decrypting(self):
+        self.upload('cbc.bin', b'x' * 1000, 'AES-256-CBC')
+        self.assertIsNone(self.store.stat('cbc.bin'))
+
+    def test_replace_keeps_only_newest_upload(self):
+        self.upload('a.txt', b'first')
+        self.read('a.txt')
+        version = self.store.stat('a.txt')[1]
+        self.upload('a.txt', b'second')
+        self.assertEqual(self.read('a.txt'), b'second')
+        self.assertNotEqual(self.store.stat('a.txt')[1], version)
+        self.assertEqual(len(self.stored_ciphertexts()), 1)
+        self.assertEqual(len(self.cached()), 1)
+        # Another process reading the same index sees the same file
+        with self.open_store().open('a.txt') as f:
+            self.assertEqual(f.read(), b'second')
+
+    def test_discard_forgets_upload_and_deletes_its_files(self):
+        self.upload('a.txt', b'alpha')
+        self.upload('b.txt', b'beta')
+        self.read('a.txt')
+        self.store.discard('a.txt')
+        self.store.discard('missing.txt')  # Nothing stored: no-op
+        self.assertNotIn('a.txt', self.store)
+        with self.assertRaises(FileNotFoundError):
+            self.store.open('a.txt')
+        self.assertEqual(len(self.stored_ciphertexts()), 1)
+        self.assertEqual(self.cached(), [])
+        self.assertEqual(self.open_store().names(), ['b.txt'])
+
+    def test_evict_cache_removes_plaintext_and_locks(self):
+        self.upload('a.txt', b'alpha')
+        self.read('a.txt')
+        self.assertTrue(self.store.evict_cache(max_age=3600))  # Read just now: kept
+        self.assertEqual(len(self.cached()), 1)
+        self.assertFalse(self.store.evict_cache())
+        self.assertEqual(self.cached(), [])
+        self.assertEqual(self.store._decrypt_locks, {})
+        self.assertEqual(self.read('a.txt'), b'alpha')  # Decrypted again
+
+    def test_export_leaves_no_plaintext_in_cache(self):
+        self.upload('a.txt', b'alpha')
+        destination = os.path.join(self.save_directory, 'exported.txt')
+        self.store.export('a.txt', destination)
+        with open(destination, 'rb') as f:
+            self.assertEqual(f.read(), b'alpha')
+        self.assertEqual(self.cached(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()